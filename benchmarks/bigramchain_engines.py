@@ -0,0 +1,72 @@
+"""
+Compares the memory use and speed of BigramChain and CompactBigramChain.
+Usage: python benchmarks/bigramchain_engines.py [language_plugin_name] [--words word ...]
+"""
+import codecs
+import gc
+import os
+import random
+import tracemalloc
+from itertools import islice
+
+from common import argument_parser, load_generator, timed
+
+from wuggy.utilities.bigramchain import BigramChain
+from wuggy.utilities.compactbigramchain import CompactBigramChain
+
+
+def traced_size(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def filter_and_generate(chain, reference_sequence, ncandidates):
+    subchain = chain.attribute_filter(reference_sequence, "segment_length")
+    subchain = subchain.frequency_filter(reference_sequence, 2, 2)
+    subchain = subchain.clean(len(reference_sequence) - 1)
+    subchain.set_startkeys()
+    return len(list(islice(subchain.generate(), ncandidates)))
+
+
+def main():
+    parser = argument_parser(__doc__)
+    parser.add_argument("--ncandidates", type=int, default=1000)
+    args = parser.parse_args()
+    generator = load_generator(args, use_cache=False)
+    language_plugin = generator.language_plugin
+    data_path = os.path.join(generator.language_plugin_data_path, language_plugin.default_data)
+
+    def build_bigramchain():
+        chain = BigramChain(language_plugin)
+        chain.load(codecs.open(data_path, 'r', encoding='utf-8'))
+        return chain
+    bigramchain, dict_size = traced_size(build_bigramchain)
+    compact_bigramchain, compact_size = traced_size(
+        lambda: CompactBigramChain.from_bigramchain(bigramchain))
+    print(f"memory  dict: {dict_size / 2**20:8.1f} MiB   compact: {compact_size / 2**20:8.1f} MiB "
+          f"(arrays {compact_bigramchain.table.nbytes() / 2**20:.1f} MiB)")
+
+    words = args.words or ["car", "trumpet", "bicycle", "helicopter"]
+    for word in words:
+        segments = generator.lookup_reference_segments(word)
+        if segments is None:
+            print(f"{word}: not in lookup lexicon")
+            continue
+        reference_sequence = language_plugin.transform(segments).representation
+        timings = []
+        for chain in (bigramchain, compact_bigramchain):
+            random.seed(0)
+            timings.append(timed(filter_and_generate, chain, reference_sequence,
+                                 args.ncandidates, repeat=3))
+        (dict_count, dict_time), (compact_count, compact_time) = timings
+        print(f"{word:>14}  dict: {dict_time * 1000:8.1f} ms ({dict_count} candidates)   "
+              f"compact: {compact_time * 1000:8.1f} ms ({compact_count} candidates)")
+
+
+if __name__ == "__main__":
+    main()
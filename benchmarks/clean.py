@@ -0,0 +1,65 @@
+"""
+Times BigramChain.clean() against the previous fixed-point implementation, which rebuilt the chain
+until it stopped shrinking, on the segment length subchains of 3- and 4-syllable reference words.
+Both must leave the same set of completable paths: the two-pass version additionally drops keys
+that can not be reached from position 0, which never lie on a generated path.
+Usage: python benchmarks/clean.py [language_plugin_name] [--nwords n]
+"""
+from common import argument_parser, load_generator, timed
+
+from wuggy.utilities.bigramchain import BigramChain
+
+
+def fixed_point_clean(chain, maxpos):
+    result = BigramChain(chain.language_plugin)
+    for key, nextkeys in chain.items():
+        for nextkey, frequency in nextkeys.items():
+            if nextkey in chain or nextkey.position == maxpos:
+                result[key][nextkey] = frequency
+    if len(chain) == len(result):
+        return result
+    return fixed_point_clean(result, maxpos)
+
+
+def reachable_transitions(chain):
+    reachable = set(key for key in chain if key.position == 0)
+    for key in sorted(chain, key=lambda key: key.position):
+        if key in reachable:
+            reachable.update(chain[key])
+    return dict((key, nextkeys) for key, nextkeys in chain.items() if key in reachable)
+
+
+def main():
+    parser = argument_parser(__doc__)
+    parser.add_argument("--nwords", type=int, default=10)
+    parser.add_argument("--verify", action="store_true",
+                        help="also check that both versions leave the same paths")
+    args = parser.parse_args()
+    generator = load_generator(args)
+    language_plugin = generator.language_plugin
+    for nsyllables in (3, 4):
+        words = args.words or [word for word, segments in generator.lookup_lexicon.items()
+                               if segments.count("-") == nsyllables - 1][:args.nwords]
+        old_total = new_total = 0
+        for word in words:
+            segments = generator.lookup_reference_segments(word)
+            reference_sequence = language_plugin.transform(segments).representation
+            subchain = generator.bigramchain.attribute_filter(reference_sequence, "segment_length")
+            maxpos = len(reference_sequence) - 1
+            old, old_time = timed(fixed_point_clean, subchain, maxpos, repeat=3)
+            new, new_time = timed(subchain.clean, maxpos, repeat=3)
+            old_total += old_time
+            new_total += new_time
+            if args.verify and reachable_transitions(old) != dict(new):
+                raise AssertionError(f"clean() changed the completable paths for {word}")
+            print(f"{word:>16} ({nsyllables} syllables)  fixed point: {old_time * 1000:8.1f} ms"
+                  f"   two-pass: {new_time * 1000:8.1f} ms   keys: {len(old)} -> {len(new)}")
+        if words:
+            print(f"{nsyllables} syllables, mean  fixed point: {old_total / len(words) * 1000:8.1f} ms"
+                  f"   two-pass: {new_total / len(words) * 1000:8.1f} ms")
+        if args.words:
+            break
+
+
+if __name__ == "__main__":
+    main()
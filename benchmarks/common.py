@@ -0,0 +1,52 @@
+"""
+Shared helpers for the benchmark scripts in this folder.
+The scripts are meant to be run from the repository root, e.g. `python benchmarks/bigramchain_engines.py orthographic_english`.
+A local language plugin can be benchmarked with --plugin-file and --plugin-class.
+"""
+import argparse
+import importlib.util
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def argument_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("language_plugin_name", nargs="?", default="orthographic_english")
+    parser.add_argument("--plugin-file", help="path to the module of a local language plugin")
+    parser.add_argument("--plugin-class", default="OfficialLanguagePlugin",
+                        help="class name of the local language plugin")
+    parser.add_argument("--words", nargs="*", help="reference words to benchmark with")
+    return parser
+
+
+def local_language_plugin(args):
+    """
+    Returns an instance of the local language plugin given on the command line, if any.
+    """
+    if args.plugin_file is None:
+        return None
+    spec = importlib.util.spec_from_file_location("benchmarked_plugin", args.plugin_file)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return getattr(module, args.plugin_class)()
+
+
+def load_generator(args, **load_arguments):
+    from wuggy import WuggyGenerator
+    generator = WuggyGenerator()
+    generator.load(args.language_plugin_name, local_language_plugin(args), **load_arguments)
+    return generator
+
+
+def timed(function, *args, repeat=1, **kwargs):
+    """
+    Returns the result of the last call and the mean wall time of a call in seconds.
+    """
+    start = perf_counter()
+    for _ in range(repeat):
+        result = function(*args, **kwargs)
+    return result, (perf_counter() - start) / repeat
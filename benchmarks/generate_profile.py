@@ -0,0 +1,40 @@
+"""
+Times generate_classic, then profiles it with cProfile and prints the functions in which it spends the most time,
+to see where the generate loop spends its time per candidate (statistics, lexicality, bigramchain walks...).
+Words for which the search runs out of candidates before max_search_time (such as short words) do a fixed amount of work,
+so their times can be compared between versions.
+Usage: python benchmarks/generate_profile.py [language_plugin_name] [--words word ...] [--ncandidates n] [--top n]
+"""
+import cProfile
+import pstats
+import random
+
+from common import argument_parser, load_generator, timed
+
+
+def main():
+    parser = argument_parser(__doc__)
+    parser.add_argument("--ncandidates", type=int, default=10, help="pseudowords per word")
+    parser.add_argument("--max-search-time", type=float, default=10, help="seconds per word")
+    parser.add_argument("--top", type=int, default=20, help="number of functions to list")
+    parser.add_argument("--sort", default="tottime", help="pstats sort key, e.g. tottime or cumulative")
+    args = parser.parse_args()
+    generator = load_generator(args)
+    words = args.words or [word for word in ("trumpet", "bicycle", "car", "window", "garden")
+                           if generator.lookup_reference_segments(word) is not None]
+    if not words:
+        words = list(generator.lookup_lexicon)[:5]
+    options = dict(ncandidates_per_sequence=args.ncandidates, max_search_time_per_sequence=args.max_search_time)
+    # The first run also builds lazily initialised indexes, such as the deletion neighborhood index
+    generator.generate_classic(words, **options)
+    random.seed(0)
+    matches, elapsed = timed(generator.generate_classic, words, **options)
+    print(f"{len(matches)} pseudowords for {', '.join(words)} in {elapsed:.2f} s")
+    random.seed(0)
+    profile = cProfile.Profile()
+    profile.runcall(generator.generate_classic, words, **options)
+    pstats.Stats(profile).sort_stats(args.sort).print_stats(args.top)
+
+
+if __name__ == "__main__":
+    main()
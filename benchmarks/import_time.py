@@ -0,0 +1,78 @@
+"""
+Measures the time it takes to import wuggy, using the interpreter's -X importtime report, and fails when it exceeds a budget.
+Only modules which are not already imported when the interpreter starts are counted, and the median of several runs is kept.
+The budget is relative to the time it takes to import the standard library modules wuggy needs, measured in the same way,
+so it does not depend on the speed of the machine.
+It also fails when the import pulls in a module which wuggy should only import on first use (e.g. NumPy or Levenshtein).
+Usage: python benchmarks/import_time.py [--max-ratio ratio] [--repeat n]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATEMENTS = ["import wuggy", "from wuggy import WuggyGenerator"]
+
+# The standard library modules imported by wuggy.generators.wuggygenerator, which the budget is relative to
+REFERENCE_STATEMENT = "import bisect, codecs, collections, copy, fractions, functools, importlib.util, pathlib, random, " \
+                      "shutil, time, types, typing, warnings"
+
+# Modules only needed by some features, which must not be imported by the statements above
+DEFERRED_MODULES = ["Levenshtein", "csv", "multiprocessing", "numpy", "statsmodels", "urllib.request"]
+
+
+def top_level_imports(statement):
+    """
+    Returns the cumulative import time in microseconds of every module imported at the top level by the statement.
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], cwd=REPOSITORY,
+                             capture_output=True, text=True, check=True)
+    imports = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and not name[1:].startswith(" "):
+            imports[name.strip()] = int(cumulative)
+    return imports
+
+
+def import_time(statement, repeat):
+    startup_modules = set(top_level_imports("pass"))
+    return statistics.median(sum(cumulative for name, cumulative in top_level_imports(statement).items()
+                                 if name not in startup_modules)
+                             for _ in range(repeat)) / 1000
+
+
+def deferred_modules_imported(statement):
+    process = subprocess.run([sys.executable, "-c", f"{statement}; import sys; print(*sys.modules)"],
+                             cwd=REPOSITORY, capture_output=True, text=True, check=True)
+    modules = set(process.stdout.split())
+    return [name for name in DEFERRED_MODULES if name in modules]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-ratio", type=float, default=2,
+                        help="budget per statement, as a multiple of the import time of the standard library modules")
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+    reference = import_time(REFERENCE_STATEMENT, args.repeat)
+    print(f"{'standard library modules':<36} {reference:8.1f} ms")
+    failed = False
+    for statement in STATEMENTS:
+        milliseconds = import_time(statement, args.repeat)
+        deferred = deferred_modules_imported(statement)
+        within_budget = milliseconds <= args.max_ratio * reference and not deferred
+        failed = failed or not within_budget
+        print(f"{statement:<36} {milliseconds:8.1f} ms  {milliseconds / reference:4.1f}x  "
+              f"{'ok' if within_budget else 'OVER BUDGET'}"
+              + (f"  (imports {', '.join(deferred)})" if deferred else ""))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Times OLD-n through the NeighborIndex (length buckets, bounded heap, cutoff-aware distances) against the former
+implementation, which computed the distance to every word of the neighbor lexicon and sorted the whole list.
+Both must return the same value; the script stops with an AssertionError otherwise.
+Usage: python benchmarks/old.py [language_plugin_name] [--nwords n] [--n n ...]
+"""
+import random
+
+from common import argument_parser, load_generator, timed
+
+# Pylint may report no-member error due to C extension
+import Levenshtein
+
+
+def sorting_old(source, lexicon, n):
+    neighbors = []
+    for target in lexicon:
+        neighbors.append((target, Levenshtein.distance(source, target)))
+    neighbors.sort(key=lambda x: x[1])
+    return sum(distance for neighbor, distance in neighbors[0:n]) / float(n)
+
+
+def main():
+    parser = argument_parser(__doc__)
+    parser.add_argument("--nwords", type=int, default=50)
+    parser.add_argument("--n", type=int, nargs="*", default=[20])
+    args = parser.parse_args()
+    generator = load_generator(args)
+    words = args.words or random.Random(0).sample(generator.neighbor_lexicon, args.nwords)
+    print(f"{len(generator.neighbor_lexicon)} words in the neighbor lexicon, {len(words)} queries")
+    for n in args.n:
+        sorting_total = index_total = 0
+        for word in words:
+            expected, sorting_time = timed(sorting_old, word, generator.neighbor_lexicon, n)
+            result, index_time = timed(generator.neighbor_index.old, word, n)
+            if result != expected:
+                raise AssertionError(f"OLD{n} of {word}: {result} != {expected}")
+            sorting_total += sorting_time
+            index_total += index_time
+        print(f"OLD{n:<4} full sort: {sorting_total / len(words) * 1000:8.2f} ms"
+              f"   index: {index_total / len(words) * 1000:8.2f} ms"
+              f"   speedup: {sorting_total / index_total:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Measures the cost per candidate of the duplicate check in the generators (a membership test followed by an insert),
+for the former list based cache and for SequenceCache in its default and Bloom filter modes, as the cache grows.
+Usage: python benchmarks/sequence_cache.py [--sizes n ...]
+"""
+import argparse
+import random
+import string
+from time import perf_counter
+
+import common  # noqa: F401 (puts the repository on the path)
+
+from wuggy.utilities.sequencecache import SequenceCache
+
+
+def per_candidate_cost(cache, add, candidates, batch):
+    """
+    Fills the cache with all candidates and returns the mean cost per candidate of the last batch.
+    """
+    for candidate in candidates[:-batch]:
+        if candidate not in cache:
+            add(candidate)
+    start = perf_counter()
+    for candidate in candidates[-batch:]:
+        if candidate not in cache:
+            add(candidate)
+    return (perf_counter() - start) / batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 10000, 50000])
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+    rng = random.Random(0)
+    for size in args.sizes:
+        candidates = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10)))
+                      for _ in range(size)]
+        list_cache = []
+        hashed_cache = SequenceCache()
+        bloom_cache = SequenceCache(bloom_capacity=max(args.sizes))
+        costs = [per_candidate_cost(list_cache, list_cache.append, candidates, args.batch),
+                 per_candidate_cost(hashed_cache, hashed_cache.add, candidates, args.batch),
+                 per_candidate_cost(bloom_cache, bloom_cache.add, candidates, args.batch)]
+        print(f"{size:>8} candidates  list: {costs[0] * 1e6:9.2f} us   hashed: {costs[1] * 1e6:6.2f} us"
+              f"   bloom: {costs[2] * 1e6:6.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Times generate_classic over a list of reference words without and with the subchain cache, which lets words with the
+same segment lengths and reference transition frequencies share their attribute and frequency filtered subchains.
+The cached run is timed twice: once starting empty and once more with the subchains of the first run in the cache.
+Only one pseudoword is generated per word, so most of the time goes to filtering the bigramchain.
+Every run is repeated and the fastest time is reported, since single runs are noisy.
+Usage: python benchmarks/subchain_cache.py [language_plugin_name] [--words word ...] [--nwords n] [--cache-size bytes] [--repeat n] [--compact]
+"""
+import random
+
+from common import argument_parser, local_language_plugin, timed
+
+
+def main():
+    from wuggy import WuggyGenerator
+    from wuggy.utilities.languagecontext import DEFAULT_SUBCHAIN_CACHE_SIZE
+    parser = argument_parser(__doc__)
+    parser.add_argument("--nwords", type=int, default=200, help="number of lexicon words to use without --words")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_SUBCHAIN_CACHE_SIZE,
+                        help="subchain_cache_size of the cached runs, in bytes")
+    parser.add_argument("--repeat", type=int, default=3, help="number of times every run is repeated")
+    parser.add_argument("--compact", action="store_true", help="use a CompactBigramChain")
+    args = parser.parse_args()
+    for subchain_cache_size in (0, args.cache_size):
+        generator = WuggyGenerator(subchain_cache_size=subchain_cache_size)
+        generator.load(args.language_plugin_name, local_language_plugin(args), compact=args.compact)
+        words = args.words or list(generator.lookup_lexicon)[:args.nwords]
+        # Builds lazily initialised indexes, such as the deletion neighborhood index, outside of the timed runs
+        generator.generate_classic(words[:1], ncandidates_per_sequence=1)
+        runs = ("uncached",) if subchain_cache_size == 0 else ("cold cache", "warm cache")
+        for run in runs:
+            elapsed = float("inf")
+            for _ in range(args.repeat):
+                if run != "warm cache" and generator.subchain_cache is not None:
+                    generator.subchain_cache.clear()
+                    generator.position_frequencies_cache.clear()
+                random.seed(0)
+                matches, run_elapsed = timed(generator.generate_classic, words, ncandidates_per_sequence=1)
+                elapsed = min(elapsed, run_elapsed)
+            cached = "" if generator.subchain_cache is None else \
+                f", {len(generator.subchain_cache)} cached subchains of {generator.subchain_cache.size / 2**20:.1f} MB"
+            print(f"{run:>10}: {len(matches)} pseudowords for {len(words)} words in {elapsed:.2f} s{cached}")
+
+
+if __name__ == "__main__":
+    main()
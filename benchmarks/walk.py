@@ -0,0 +1,44 @@
+"""
+Compares the two ways to draw candidates from a bigramchain: the depth first walk of generate, which enumerates
+every path once, and sample, which draws paths in proportion to their transition frequencies.
+For every reference word it reports their throughput, and the diversity of their first candidates:
+the mean number of distinct segments per position among the first --first candidates.
+Usage: python benchmarks/walk.py [language_plugin_name] [--words word ...] [--compact]
+"""
+import random
+from itertools import islice
+
+from common import argument_parser, load_generator, timed
+
+
+def diversity(paths):
+    """
+    Returns the mean number of distinct segments per position over the paths.
+    """
+    positions = list(zip(*paths))
+    return sum(len(set(segments)) for segments in positions) / max(1, len(positions))
+
+
+def main():
+    parser = argument_parser(__doc__)
+    parser.add_argument("--compact", action="store_true", help="benchmark a CompactBigramChain")
+    parser.add_argument("--paths", type=int, default=20000, help="number of paths to time")
+    parser.add_argument("--first", type=int, default=50, help="number of first candidates to measure diversity over")
+    args = parser.parse_args()
+    generator = load_generator(args, compact=args.compact)
+    words = args.words or list(generator.lookup_lexicon)[:5]
+    print(f"{'word':<16} {'walk paths/s':>12} {'sample paths/s':>14} {'walk diversity':>14} {'sample diversity':>16}")
+    for word in words:
+        generator.set_reference_sequence(generator.lookup_reference_segments(word))
+        chain = generator.bigramchain.attribute_filter(generator.reference_sequence, "segment_length")
+        chain = chain.clean(len(generator.reference_sequence) - 1)
+        chain.set_startkeys(generator.reference_sequence)
+        random.seed(0)
+        walked, walk_time = timed(lambda: list(islice(chain.generate(), args.paths)))
+        sampled, sample_time = timed(lambda: list(islice(chain.sample(random.Random(0)), args.paths)))
+        print(f"{word:<16} {len(walked) / walk_time:12.0f} {len(sampled) / sample_time:14.0f} "
+              f"{diversity(walked[:args.first]):14.2f} {diversity(sampled[:args.first]):16.2f}")
+
+
+if __name__ == "__main__":
+    main()
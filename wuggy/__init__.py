@@ -1,4 +1,24 @@
 ".. include:: ../documentation/home.md"
-from wuggy.evaluators.ld1nn import ld1nn
-from wuggy.generators.wuggygenerator import WuggyGenerator
-from wuggy.plugins.baselanguageplugin import BaseLanguagePlugin
+from importlib import import_module
+
+# Public names and the modules they live in: modules are only imported on first access, keeping `import wuggy` cheap
+_lazy_imports = {
+    "IncrementalLD1NN": "wuggy.evaluators.ld1nn",
+    "ld1nn": "wuggy.evaluators.ld1nn",
+    "WuggyGenerator": "wuggy.generators.wuggygenerator",
+    "BaseLanguagePlugin": "wuggy.plugins.baselanguageplugin",
+}
+
+__all__ = list(_lazy_imports)
+
+
+def __getattr__(name):
+    if name not in _lazy_imports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_lazy_imports[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,11 +1,108 @@
+from collections import defaultdict
 from math import exp
 
-from Levenshtein import distance
+
+def _deletion_variants(stimulus: str, max_deletions: int) -> set:
+    """
+    Returns the stimulus and every string made by deleting up to max_deletions of its letters.
+    """
+    variants = set((stimulus,))
+    frontier = variants
+    for _ in range(max_deletions):
+        frontier = set(variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant)))
+        variants |= frontier
+    return variants
+
+
+class _NearestNeighbors():
+    """
+    The stimuli presented so far, bucketed by length, with the number of times each was presented as a word and as a nonword.
+    Stimuli are also indexed by their deletion variants (see _deletion_variants): two stimuli at a Levenshtein distance
+    of at most max_deletions share a variant, so neighbors that close are found without scanning the buckets.
+    Only stimuli without any neighbor that close fall back to a scan of the buckets, which grows with the number of stimuli.
+    """
+
+    max_deletions = 2
+
+    def __init__(self):
+        self.buckets = defaultdict(dict)
+        self.max_length = 0
+        self.variants = defaultdict(list)
+
+    def add(self, stimulus: str, is_word: bool) -> None:
+        bucket = self.buckets[len(stimulus)]
+        if stimulus not in bucket:
+            bucket[stimulus] = [0, 0]
+            for variant in _deletion_variants(stimulus, self.max_deletions):
+                self.variants[variant].append(stimulus)
+        bucket[stimulus][0 if is_word else 1] += 1
+        self.max_length = max(self.max_length, len(stimulus))
+
+    def nearest(self, stimulus: str) -> (int, int, int):
+        """
+        Returns the distance from the stimulus to the nearest stimuli presented so far,
+        and how many of those nearest stimuli were words and nonwords.
+        """
+        length = len(stimulus)
+        exact = self.buckets.get(length, {}).get(stimulus)
+        if exact is not None:
+            return 0, exact[0], exact[1]
+        from Levenshtein import distance
+        minimum_distance = None
+        nwords = nnonwords = 0
+        # Every stimulus within max_deletions of this one shares a deletion variant with it
+        candidates = set()
+        for variant in _deletion_variants(stimulus, self.max_deletions):
+            candidates.update(self.variants.get(variant, ()))
+        for target in candidates:
+            target_distance = distance(stimulus, target, score_cutoff=self.max_deletions)
+            if target_distance > self.max_deletions:
+                continue
+            word_count, nonword_count = self.buckets[len(target)][target]
+            if minimum_distance is None or target_distance < minimum_distance:
+                minimum_distance, nwords, nnonwords = target_distance, word_count, nonword_count
+            elif target_distance == minimum_distance:
+                nwords += word_count
+                nnonwords += nonword_count
+        if minimum_distance is not None:
+            return minimum_distance, nwords, nnonwords
+        for length_difference in range(max(length, self.max_length - length) + 1):
+            # The distance between two stimuli is at least the difference in their lengths
+            if minimum_distance is not None and length_difference > minimum_distance:
+                break
+            for bucket_length in set((length - length_difference, length + length_difference)):
+                for target, (word_count, nonword_count) in self.buckets.get(bucket_length, {}).items():
+                    if minimum_distance is None:
+                        target_distance = distance(stimulus, target)
+                    else:
+                        target_distance = distance(stimulus, target, score_cutoff=minimum_distance)
+                    if minimum_distance is None or target_distance < minimum_distance:
+                        minimum_distance, nwords, nnonwords = target_distance, word_count, nonword_count
+                    elif target_distance == minimum_distance:
+                        nwords += word_count
+                        nnonwords += nonword_count
+        return minimum_distance, nwords, nnonwords
+
+
+def _get_probabilities(sample: [tuple], word_as_reference_level: bool, worker: int = 0, workers: int = 1) -> [tuple]:
+    """
+    Returns the index and nearest neighbor probability of every stimulus from the second one on, for which index % workers == worker.
+    Every worker indexes all stimuli, since that is cheap compared to the nearest neighbor searches it divides.
+    """
+    neighbors = _NearestNeighbors()
+    probabilities = []
+    for index, (stimulus, stimulus_type) in enumerate(sample):
+        if index > 0 and index % workers == worker:
+            _, nwords, nnonwords = neighbors.nearest(stimulus)
+            nreference = nwords if word_as_reference_level else nnonwords
+            probabilities.append((index, nreference / (nwords + nnonwords)))
+        neighbors.add(stimulus, stimulus_type == "word")
+    return probabilities
 
 
 def ld1nn(word_sample: [str],
           nonword_sample: [str],
-          word_as_reference_level=True):
+          word_as_reference_level=True, workers: int = 1):
     """
     Implementation of the LD1NN algorithm, used to automatically detect bias in pseudowords.
 
@@ -14,6 +111,7 @@ def ld1nn(word_sample: [str],
         2. Identify the previously presented stimuli that are at the k nearest distances from the current
         stimulus.
         3. Compute the probability of a word response for the given stimulus based on the relative frequency of words among the nearest neighbors.
+    Previously presented stimuli are bucketed by length, so only those that can still be at the nearest distance are compared.
 
     For more information about LD1NN, see DOI: 10.1075/ml.6.1.02keu
 
@@ -23,46 +121,91 @@ def ld1nn(word_sample: [str],
         nonword_sample: a list of nonwords words. This list must contain the same amount of items as word_sample.
 
         word_as_reference_level: set the word as reference level. If set to true, the odds returned by LD1NN represent how much likelier it is for a stimulus predicted as a word to be a word than a stimulus with a nonword prediction. If set to true, the vice versa is calculated.
+
+        workers: the number of processes over which the stimuli are divided. When processes are not forked (e.g. on Windows), calls with more than one worker must be guarded by if __name__ == "__main__" in your script.
     .. include:: ../../documentation/evaluators/ld1nn.md
     """
-    # TODO: implement a parallel processing option
-
     if (len(word_sample) != len(nonword_sample)):
         raise ValueError("Both sample lists need to contain the same amount of strings.")
 
-    def get_probability(index: int):
-        samples_with_distance = []
-        for word in sample[0:index]:
-            samples_with_distance.append((word[0], word[1], distance(word[0], sample[index][0])))
-        samples_with_distance.sort(key=lambda value: value[2])
-        minimum_distance = samples_with_distance[0][2]
-        distribution = [sample for sample in samples_with_distance if sample[2] <= minimum_distance]
-        reference_level = "word" if word_as_reference_level else "nonword"
-        probability = len([sample for sample in distribution if sample[1]
-                           == reference_level]) / len(distribution)
-
-        return probability
-
     sample = []
     for word in word_sample:
         sample.append((word, "word"))
     for word in nonword_sample:
         sample.append((word, "nonword"))
 
-    index = 1
     # Start from the second word
-    probabilities = [0.5]
-
-    for word in sample[1::]:
-        probabilities.append(get_probability(index))
-        index += 1
-
+    probabilities = [0.5] + [None] * (len(sample) - 1)
+    if workers > 1 and len(sample) > 2:
+        import multiprocessing
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.starmap(_get_probabilities, [(sample, word_as_reference_level, worker, workers)
+                                                        for worker in range(workers)])
+    else:
+        results = [_get_probabilities(sample, word_as_reference_level)]
+    for result in results:
+        for index, probability in result:
+            probabilities[index] = probability
+
+    return _fit(probabilities, [word[1] for word in sample], word_as_reference_level)
+
+
+def _fit(probabilities: [float], types: [str], word_as_reference_level: bool) -> dict:
+    """
+    Fits the binomial GLM of the stimulus types on the nearest neighbor probabilities.
+    """
+    import numpy as np
+    import statsmodels.api as sm
     if word_as_reference_level:
         probabilities = list(map(lambda x: x*-1, probabilities))
-
-    import statsmodels.api as sm
-    model_data = {"probabilities": probabilities, "types": [word[1] for word in sample]}
-    fit = sm.formula.glm(
-        "types~(-1+probabilities)",
-        family=sm.families.Binomial(), data=model_data).fit()
+    fit = sm.GLM(np.array([stimulus_type == "nonword" for stimulus_type in types], dtype=float),
+                 np.array(probabilities, dtype=float)[:, None], family=sm.families.Binomial()).fit()
     return {"odds": exp(fit.params[0]), "standard_error": fit.tvalues[0], "P>|z|": fit.pvalues[0]}
+
+
+class IncrementalLD1NN():
+    """
+    LD1NN for stimulus lists which are built one stimulus at a time.
+    Every stimulus is scored against the stimuli added before it when it is added, so adding all words of word_sample
+    followed by all nonwords of nonword_sample gives the same result as ld1nn(word_sample, nonword_sample).
+    The GLM is only fit when result() is called, and that fit is kept until the next stimulus is added.
+    """
+
+    def __init__(self, word_as_reference_level: bool = True):
+        self.word_as_reference_level = word_as_reference_level
+        self.neighbors = _NearestNeighbors()
+        self.types = []
+        self.probabilities = []
+        self.__result = None
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def add(self, stimulus: str, is_word: bool) -> float:
+        """
+        Adds a word or nonword to the stimulus list.
+        Returns the probability of a word response (a nonword response if word_as_reference_level is False) for the stimulus,
+        based on its nearest neighbors among the stimuli added before it.
+        Stimuli with a neighbor at most two edits away are found through an index, so their cost does not grow with the list;
+        stimuli without such a neighbor are still compared against every stimulus of similar length, which is linear.
+        """
+        if len(self.types) == 0:
+            probability = 0.5
+        else:
+            _, nwords, nnonwords = self.neighbors.nearest(stimulus)
+            nreference = nwords if self.word_as_reference_level else nnonwords
+            probability = nreference / (nwords + nnonwords)
+        self.neighbors.add(stimulus, is_word)
+        self.types.append("word" if is_word else "nonword")
+        self.probabilities.append(probability)
+        self.__result = None
+        return probability
+
+    def result(self) -> dict:
+        """
+        Returns the odds, standard error and P value of the stimulus list so far, in the same format as ld1nn().
+        Requires both words and nonwords to have been added.
+        """
+        if self.__result is None:
+            self.__result = _fit(self.probabilities, self.types, self.word_as_reference_level)
+        return self.__result
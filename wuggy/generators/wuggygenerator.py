@@ -2,19 +2,19 @@ import codecs
 import copy
 import importlib
 import importlib.util
-import inspect
 import os
+import random
 import sys
+from bisect import bisect_left, bisect_right
 from collections import defaultdict, namedtuple
-from csv import writer
 from fractions import Fraction
 from functools import wraps
 from pathlib import Path
 from shutil import rmtree
 from sys import stdout
 from time import time
+from types import MappingProxyType
 from typing import Dict, Generator, Optional, Union
-from urllib.request import urlopen
 from warnings import warn
 
 
@@ -52,7 +52,31 @@ _BUNDLED_PLUGINS_DIR = (
 )
 
 from ..plugins.baselanguageplugin import BaseLanguagePlugin
-from ..utilities.bigramchain import BigramChain
+from ..utilities.bigramchain import BigramChain, PathConstraints
+from ..utilities.languagecontext import (DEFAULT_SUBCHAIN_CACHE_SIZE, LanguageContext, read_language_data,
+                                         write_language_data)
+from ..utilities.lrucache import LRUCache
+from ..utilities.neighborindex import NeighborIndex
+from ..utilities.sequencecache import SequenceCache
+from ..utilities.statisticspipeline import StatisticsPipeline
+
+
+# The generator of the pool which started this worker process, set by _initialize_worker
+_worker_generator = None
+
+
+def _initialize_worker(generator):
+    """
+    Initializer of the worker processes forked by generate_classic(workers=...).
+    The generator is inherited through the fork rather than pickled, and every pool passes its own.
+    """
+    global _worker_generator
+    _worker_generator = generator
+
+
+def _generate_classic_in_worker(arguments):
+    input_sequence, options = arguments
+    return _worker_generator.generate_classic([input_sequence], **options)
 
 
 def _loaded_language_plugin_required(func):
@@ -84,9 +108,19 @@ def _loaded_language_plugin_required_generator(func):
 
 
 class WuggyGenerator():
-    def __init__(self):
+    def __init__(self, memory_budget: int = None, subchain_cache_size: int = DEFAULT_SUBCHAIN_CACHE_SIZE):
+        """
+        Parameters:
+            memory_budget: the approximate number of bytes the loaded language plugins may use together. When loading a language plugin exceeds it, the least recently used language plugins are unloaded. By default, every loaded language plugin stays resident, so switching back to it with load() costs nothing.
+
+            subchain_cache_size: the approximate number of bytes of filtered subchains kept per loaded language plugin. Attribute and frequency filters only depend on the attribute values and transition frequencies of the reference sequence, so reference sequences which share them (such as words with the same segment lengths) reuse the subchains filtered for earlier ones, across generation requests and sessions. The least recently used subchains are evicted first. The full cache size counts towards memory_budget. Set to 0 to filter anew for every reference sequence.
+
+
+        To reuse the statistics of reference sequences across runs and processes, assign a ReferenceStatisticsCache (see wuggy.utilities.referencestatisticscache) to the reference_statistics_cache property.
+        """
         self.bigramchain = None
-        self.bigramchains = {}
+        self.language_contexts = LRUCache(
+            memory_budget, (lambda context: context.nbytes()) if memory_budget is not None else None)
         self.supported_official_language_plugin_names = [
             "orthographic_basque",
             "orthographic_dutch",
@@ -106,35 +140,71 @@ class WuggyGenerator():
             "phonetic_french",
             "phonetic_italian"]
         self.__official_language_plugin_repository_url = "https://raw.githubusercontent.com/WuggyCode/wuggy_language_plugin_data/master"
+        self.supported_statistics = ()
+        self.supported_attribute_filters = {}
+        self.default_attributes = []
+        self.word_lexicon = {}
+        self.neighbor_lexicon = ()
+        self.neighbor_index = NeighborIndex(())
+        self.lookup_lexicon = MappingProxyType({})
+        self.subchain_cache_size = subchain_cache_size
+        self.subchain_cache = None
+        self.position_frequencies_cache = None
+        self.reference_statistics_cache = None
+        self.__reset_generation_state()
+
+    def __reset_generation_state(self) -> None:
+        """
+        Resets the state of the current generation request, leaving the loaded language plugin data untouched.
+        """
         self.attribute_subchain = None
         self.frequency_subchain = None
+        # The key under which attribute_subchain is cached, paired with it to detect assignments from outside
+        self.__keyed_attribute_subchain = None
         self.reference_sequence = None
         self.frequency_filter = None
         self.current_sequence = None
         self.output_mode = None
-        self.supported_statistics = ()
-        self.supported_attribute_filters = {}
         self.attribute_filters = {}
-        self.default_attributes = []
         self.statistics = {}
-        self.word_lexicon = defaultdict(list)
-        self.neighbor_lexicon = []
         self.reference_statistics = {}
         self.stat_cache = {}
-        self.sequence_cache = []
+        self.sequence_cache = SequenceCache()
         self.difference_statistics = {}
         self.match_statistics = {}
-        self.lookup_lexicon = {}
+
+    def session(self) -> "WuggyGenerator":
+        """
+        Returns a generator which shares the loaded language plugin data (bigram chains, lexicons, neighbor index) with this generator,
+        but keeps its own generation state (reference sequence, filters, statistics and caches).
+        Sessions are cheap to create: use one session per thread or asyncio task to generate concurrently against a single load.
+        The shared data must not be changed while sessions are generating, so do not call load() on a session.
+        """
+        session = copy.copy(self)
+        session.__reset_generation_state()
+        return session
 
     def load(self, language_plugin_name: str,
-             local_language_plugin: BaseLanguagePlugin = None) -> None:
+             local_language_plugin: BaseLanguagePlugin = None, use_cache: bool = True,
+             compact: bool = False, language_data_directory: str = None) -> None:
         """
         Loads in a language plugin, if available, and stores the corresponding bigramchains.
         Parameters:
             language_plugin_name: must be the exact string of an official language plugin (see self.supported_official_language_plugin_names). If you are loading in a local plugin, the name can be anything as long as it does not conflict with an already loaded plugin name.
 
             local_language_plugin: must be a child class of BaseLanguagePlugin: see BaseLanguagePlugin for more information on how to create a custom language plugin.
+
+            use_cache: determines whether the compiled bigramchain is read from (and written to) a binary cache file next to the plugin data. The cache is tagged with the plugin version, the cache format version and a hash of the plugin, the data files and the Wuggy modules which build the bigramchain, and is rebuilt automatically when any of them changes.
+
+            compact: determines whether the bigramchain is stored as a CompactBigramChain, which keeps the transitions in shared NumPy arrays instead of nested dictionaries. This uses a fraction of the memory and generates the same pseudowords. Filters are then masks over the shared arrays, so filtering for a reference sequence never copies the bigramchain, while the default BigramChain builds one filtered copy for every attribute filter and frequency band.
+
+            language_data_directory: a directory written by save_language_data for this language plugin. The bigramchain and lexicons are then memory mapped from that directory instead of being parsed, so they load almost instantly and every process which loads the same directory shares a single copy of them. The bigramchain is always a CompactBigramChain. Raises a ValueError if the directory was saved from different plugin data.
         """
+        if language_plugin_name in self.language_contexts:
+            # Resident language plugins are activated without resolving the plugin again
+            self.__activate(language_plugin_name)
+            return
+        import inspect
         if local_language_plugin:
             # TODO: if someone does not pass a class INSTANCE, they get TypeError: <class 'type'> is a built-in class, this is a vague error and probably should be abstracted
             self.language_plugin_data_path = os.path.dirname(
@@ -177,17 +247,106 @@ class WuggyGenerator():
                     f".plugins.language_data.{language_plugin_name}.{language_plugin_name}",
                     "wuggy").OfficialLanguagePlugin()
 
-        if language_plugin_name not in self.bigramchains:
+        if language_plugin_name not in self.language_contexts and language_data_directory is not None:
+            data_tag = self.__get_language_data_tag(language_plugin)
+            language_data = read_language_data(language_data_directory, language_plugin, data_tag)
+            if language_data is None:
+                raise ValueError(
+                    f"{language_data_directory} does not contain language data saved from the current data of this language plugin, use save_language_data to (re)create it.")
+            context = self.__build_language_context(*language_data)
+            context.data_tag = data_tag
+            self.language_contexts[self.language_plugin_name] = context
+        if language_plugin_name not in self.language_contexts:
+            if compact:
+                from ..utilities.compactbigramchain import CompactBigramChain
             default_data_path = os.path.join(
                 self.language_plugin_data_path, language_plugin.default_data)
-
-            data_file = codecs.open(default_data_path, 'r', encoding='utf-8')
-            self.bigramchains[self.language_plugin_name] = BigramChain(
-                language_plugin)
-            self.bigramchains[self.language_plugin_name].load(
-                data_file)
+            bigramchain = (CompactBigramChain if compact else BigramChain)(language_plugin)
+            cache_path = default_data_path + ".bigramchain"
+            cache_tag = self.__get_bigramchain_cache_tag(language_plugin, default_data_path) if use_cache else None
+            # Without a tag (the plugin source can not be found) the cache can not be validated, so it is not used
+            use_cache = cache_tag is not None
+            if not (use_cache and bigramchain.load_compiled(cache_path, cache_tag)):
+                data_file = codecs.open(default_data_path, 'r', encoding='utf-8')
+                parsed_bigramchain = BigramChain(language_plugin)
+                parsed_bigramchain.load(data_file)
+                if use_cache:
+                    try:
+                        parsed_bigramchain.dump_compiled(cache_path, cache_tag)
+                    except OSError:
+                        # Read-only plugin folders (e.g. bundled plugins) simply go uncached
+                        pass
+                bigramchain = (CompactBigramChain.from_bigramchain(parsed_bigramchain)
+                               if compact else parsed_bigramchain)
+            self.language_contexts[self.language_plugin_name] = self.__build_language_context(bigramchain)
         self.__activate(self.language_plugin_name)
 
+    def __get_plugin_source_path(self, language_plugin: BaseLanguagePlugin) -> Optional[str]:
+        """
+        Returns the path of the source file of a language plugin, or None if it can not be found.
+        Downloaded official plugins are executed from their file without being registered as a module,
+        so their source is found in their folder instead.
+        Should only be used internally by load and save_language_data.
+        """
+        import inspect
+        try:
+            return inspect.getfile(language_plugin.__class__)
+        except TypeError:
+            path = os.path.join(self.language_plugin_data_path, f"{self.language_plugin_name}.py")
+            return path if os.path.isfile(path) else None
+
+    def __get_bigramchain_cache_tag(self, language_plugin: BaseLanguagePlugin, default_data_path: str,
+                                    *lexicon_paths: str) -> Optional[tuple]:
+        """
+        Returns the tag identifying a compiled bigramchain cache: the plugin class and version, the compiled format version,
+        and a hash over the plugin source, the sources of BaseLanguagePlugin and BigramChain (which transform the segments
+        and write the cache), its default data file and any given lexicon files.
+        Returns None if the plugin source can not be found.
+        Should only be used internally by load.
+        """
+        import hashlib
+        import inspect
+
+        from ..utilities import bigramchain
+        plugin_source_path = self.__get_plugin_source_path(language_plugin)
+        if plugin_source_path is None:
+            return None
+        digest = hashlib.sha1()
+        # Plugins often read their data and lexicons from the same file, which only needs to be hashed once
+        for path in dict.fromkeys((plugin_source_path, inspect.getfile(BaseLanguagePlugin), inspect.getfile(bigramchain),
+                                   default_data_path, *lexicon_paths)):
+            with open(path, 'rb') as file:
+                for block in iter(lambda: file.read(1 << 20), b''):
+                    digest.update(block)
+        return (language_plugin.__class__.__module__, language_plugin.__class__.__qualname__,
+                getattr(language_plugin, 'version', None), bigramchain.COMPILED_FORMAT_VERSION, digest.hexdigest())
+
+    def __get_language_data_tag(self, language_plugin: BaseLanguagePlugin) -> tuple:
+        """
+        Returns the tag identifying language data saved by save_language_data, which covers the lexicon files as well as the bigramchain data.
+        Raises a ValueError if the plugin source can not be found, since the data could then not be told apart from data saved from another version.
+        Should only be used internally by load and save_language_data.
+        """
+        tag = self.__get_bigramchain_cache_tag(
+            language_plugin, *(os.path.join(self.language_plugin_data_path, file_name)
+                               for file_name in (language_plugin.default_data, language_plugin.default_word_lexicon,
+                                                 language_plugin.default_neighbor_lexicon,
+                                                 language_plugin.default_lookup_lexicon)))
+        if tag is None:
+            raise ValueError(f"The source of language plugin {self.language_plugin_name} can not be found.")
+        return tag
+
+    @_loaded_language_plugin_required
+    def save_language_data(self, directory: str) -> None:
+        """
+        Saves the bigramchain and lexicons of the active language plugin to a directory, in a format which load(language_data_directory=directory) memory maps.
+        Save once (e.g. before starting a pool of worker processes or a web server), then load the directory in every process:
+        the operating system keeps a single copy of the data in memory for all of them.
+        The directory is tagged with a hash of the plugin and its data files, so load refuses it once these change.
+        """
+        write_language_data(directory, self.language_contexts[self.language_plugin_name],
+                            self.__get_language_data_tag(self.language_plugin))
+
     @staticmethod
     def remove_downloaded_language_plugins() -> None:
         """
@@ -234,6 +393,7 @@ class WuggyGenerator():
         if not os.path.exists(self.language_plugin_data_path):
             os.makedirs(self.language_plugin_data_path)
 
+        from urllib.request import urlopen
         print(
             f"Wuggy is currently downloading the plugin {language_plugin_name} for you from the official repository...")
         
@@ -260,82 +420,111 @@ class WuggyGenerator():
 
     def __activate(self, name: str) -> None:
         """
-        Activate a language plugin by setting the corresponding bigramchains and lexicon properties.
-        This deactivates and garbage collects any previously activated language plugin.
+        Activate a resident language plugin by pointing the generator at its bigramchain, lexicons and plugin properties.
         Should only be called internally, do not call on your own.
         """
         if isinstance(name, type(codecs)):
             name = name.__name__
-        self.bigramchain = self.bigramchains[name]
-        self.language_plugin = self.bigramchain.language_plugin
-        self.__load_neighbor_lexicon()
-        self.__load_word_lexicon()
-        self.__load_lookup_lexicon()
-        self.supported_statistics = self.__get_statistics()
-        self.supported_attribute_filters = self.__get_attributes()
-        self.default_attributes = self.__get_default_attributes()
+        context = self.language_contexts[name]
+        self.language_plugin = context.language_plugin
+        self.language_plugin_name = name
+        self.language_plugin_data_path = context.language_plugin_data_path
+        self.bigramchain = context.bigramchain
+        self.word_lexicon = context.word_lexicon
+        self.neighbor_lexicon = context.neighbor_lexicon
+        self.neighbor_index = context.neighbor_index
+        self.lookup_lexicon = context.lookup_lexicon
+        self.subchain_cache = context.subchain_cache
+        self.position_frequencies_cache = context.position_frequencies_cache
+        self.supported_statistics = context.supported_statistics
+        self.supported_attribute_filters = context.supported_attribute_filters
+        self.default_attributes = context.default_attributes
         self.current_language_plugin_name = name
 
-    def __load_word_lexicon(self) -> None:
+    def __build_language_context(self, bigramchain, word_lexicon: dict = None, neighbor_index: NeighborIndex = None,
+                                 lookup_lexicon=None) -> LanguageContext:
+        """
+        Bundles a bigramchain with the lexicons of the currently set language plugin.
+        Lexicons which are not given are loaded from the plugin's lexicon files.
+        Should only be used internally by load.
+        """
+        self.language_plugin = bigramchain.language_plugin
+        return LanguageContext(self.language_plugin, self.language_plugin_data_path, bigramchain,
+                               word_lexicon if word_lexicon is not None else self.__load_word_lexicon(),
+                               neighbor_index if neighbor_index is not None
+                               else NeighborIndex(self.__load_neighbor_lexicon()),
+                               lookup_lexicon if lookup_lexicon is not None else self.__load_lookup_lexicon(),
+                               self.__get_statistics(), self.__get_attributes(), self.__get_default_attributes(),
+                               self.subchain_cache_size)
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Returns an estimate of the memory used by every resident language plugin, in bytes, from least to most recently used.
+        """
+        return dict((name, context.nbytes()) for name, context in self.language_contexts.items())
+
+    @property
+    def bigramchains(self) -> dict:
+        """
+        The bigramchains of the resident language plugins, by name.
+        """
+        return dict((name, context.bigramchain) for name, context in self.language_contexts.items())
+
+    def __read_lexicon_lines(self, file_name: str):
+        """
+        Yields the stripped lines of a lexicon file of the currently set language plugin, one at a time.
+        """
+        with open("%s/%s" % (self.language_plugin_data_path, file_name), 'r', encoding="utf-8") as data_file:
+            for line in data_file:
+                yield line.strip()
+
+    def __load_word_lexicon(self) -> Dict[tuple, frozenset]:
         """
         Loads the default word lexicon for the currently set language plugin.
+        Returns the words grouped by their first letter and length, as frozensets, so that lexicality is checked in constant time.
         This is currently used internally by __activate only, do not call on your own.
         """
         cutoff = 0
-        data_file = codecs.open(
-            "%s/%s" % (self.language_plugin_data_path, self.language_plugin.default_word_lexicon),
-            'r', encoding="utf-8")
-        self.word_lexicon = defaultdict(list)
-        lines = data_file.readlines()
-        for line in lines:
-            fields = line.strip().split('\t')
-            word = fields[0]
-            frequency_per_million = fields[-1]
+        word_lexicon = defaultdict(list)
+        for line in self.__read_lexicon_lines(self.language_plugin.default_word_lexicon):
+            # Only the first (word) and last (frequency per million) columns are used
+            word = line.partition('\t')[0]
+            frequency_per_million = line.rpartition('\t')[2]
             if float(frequency_per_million) >= cutoff:
-                self.word_lexicon[word[0], len(word)].append(word)
-        data_file.close()
+                word_lexicon[word[0], len(word)].append(word)
+        return dict((key, frozenset(words)) for key, words in word_lexicon.items())
 
-    def __load_neighbor_lexicon(self) -> None:
+    def __load_neighbor_lexicon(self) -> [str]:
         """
         Loads the default neighbor word lexicon for the currently set language plugin.
         This is currently used internally by __activate only, do not call on your own.
         """
         cutoff = 0
-        data_file = codecs.open(
-            "%s/%s" %
-            (self.language_plugin_data_path,
-             self.language_plugin.default_neighbor_lexicon),
-            'r',
-            encoding="utf-8")
-        self.neighbor_lexicon = []
-        lines = data_file.readlines()
-        for line in lines:
-            fields = line.strip().split('\t')
-            word = fields[0]
-            frequency_per_million = fields[-1]
+        neighbor_lexicon = []
+        for line in self.__read_lexicon_lines(self.language_plugin.default_neighbor_lexicon):
+            word = line.partition('\t')[0]
+            frequency_per_million = line.rpartition('\t')[2]
             if float(frequency_per_million) >= cutoff:
-                self.neighbor_lexicon.append(word)
-        data_file.close()
+                neighbor_lexicon.append(word)
+        return neighbor_lexicon
 
-    def __load_lookup_lexicon(self, data_file: bool = None) -> None:
+    def __load_lookup_lexicon(self, data_file: bool = None) -> MappingProxyType:
         """
         Loads the default lookup word lexicon for the currently set language plugin.
+        Returns a read-only mapping from words to their segments.
         This is currently used internally by __activate only, do not call on your own.
         """
-        self.lookup_lexicon = {}
+        lookup_lexicon = {}
         if data_file is None:
-            data_file = codecs.open(
-                "%s/%s" %
-                (self.language_plugin_data_path,
-                 self.language_plugin.default_lookup_lexicon),
-                'r',
-                encoding="utf-8")
-        lines = data_file.readlines()
+            lines = self.__read_lexicon_lines(self.language_plugin.default_lookup_lexicon)
+        else:
+            lines = (line.strip() for line in data_file)
         for line in lines:
-            fields = line.strip().split(self.language_plugin.separator)
-            reference, representation = fields[0:2]
-            self.lookup_lexicon[reference] = representation
-        data_file.close()
+            reference, representation = line.split(self.language_plugin.separator, 2)[0:2]
+            lookup_lexicon[reference] = representation
+        if data_file is not None:
+            data_file.close()
+        return MappingProxyType(lookup_lexicon)
 
     def lookup_reference_segments(self, reference: str) -> Optional[str]:
         """
@@ -367,13 +556,35 @@ class WuggyGenerator():
         """
         self.reference_sequence = self.language_plugin.transform(
             sequence).representation
+        self.__clear_stat_cache()
+        cache = self.reference_statistics_cache
+        if cache is not None:
+            data_tag = self.__get_active_data_tag()
+            cached = cache.get(self.language_plugin_name, data_tag, sequence)
+            if cached is not None:
+                statistics, self.reference_sequence_frequencies = cached
+                self.reference_statistics.update(statistics)
+                return
         self.reference_sequence_frequencies = self.bigramchain.get_frequencies(
             self.reference_sequence)
-        self.__clear_stat_cache()
-        for name in self.__get_statistics():
-            function = eval("self.language_plugin.statistic_%s" % (name))
-            self.reference_statistics[name] = function(
-                self, self.reference_sequence)
+        StatisticsPipeline(self, self.__get_statistics()).run(self.reference_sequence, self.reference_statistics, {}, {})
+        if cache is not None:
+            cache.put(self.language_plugin_name, data_tag, sequence, self.reference_statistics,
+                      self.reference_sequence_frequencies)
+
+    def __get_active_data_tag(self) -> str:
+        """
+        Returns the tag identifying the data of the active language plugin, as a string.
+        It is computed once per resident language plugin, since it hashes all plugin data files.
+        """
+        context = self.language_contexts.get(self.language_plugin_name)
+        if context is not None and context.data_tag is not None:
+            data_tag = context.data_tag
+        else:
+            data_tag = self.__get_language_data_tag(self.language_plugin)
+            if context is not None:
+                context.data_tag = data_tag
+        return repr(data_tag)
 
     def __get_statistics(self) -> [str]:
         """
@@ -416,7 +627,7 @@ class WuggyGenerator():
         if sequence is None:
             sequence = self.current_sequence
         for name in self.statistics:
-            function = eval("self.language_plugin.statistic_%s" % (name))
+            function = getattr(self.language_plugin, "statistic_%s" % (name))
             if (sequence, name) in self.stat_cache:
                 self.statistics[name] = self.stat_cache[(sequence, name)]
             else:
@@ -429,6 +640,48 @@ class WuggyGenerator():
                 self.difference_statistics[name] = function.difference(
                     self.statistics[name], self.reference_statistics[name])
 
+    @_loaded_language_plugin_required
+    def apply_statistics_batch(self, sequences: [tuple], names: [str] = None) -> Dict[str, Union[list, dict]]:
+        """
+        Computes statistics for many generated sequences at once, e.g. to re-score a large pool of candidates after generation.
+        Returns a columnar table: the "pseudoword" column holds the sequences in the current output mode (plain by default),
+        and "statistics", "match_statistics" and "difference_statistics" map every statistic name to a column of values, in the order of the sequences.
+        Match and difference columns are only filled in when a reference sequence is set.
+        Parameters:
+            sequences: generated sequences, as yielded by a bigramchain (e.g. generator.current_sequence).
+
+            names: the statistics to compute. Defaults to the statistics which were set beforehand, or all supported statistics if none were set.
+        """
+        if names is None:
+            names = list(self.statistics) or self.supported_statistics
+        for name in names:
+            if name not in self.supported_statistics:
+                raise ValueError(f"Statistic {name} is not supported.")
+        sequences = list(sequences)
+        # Every statistic is computed once per distinct sequence, then spread over the rows
+        unique_sequences = list(dict.fromkeys(sequences))
+        output_mode = self.output_mode if self.output_mode is not None else self.language_plugin.output_plain
+        table = {"pseudoword": [output_mode(sequence) for sequence in sequences],
+                 "statistics": {}, "match_statistics": {}, "difference_statistics": {}}
+        for name in names:
+            function = getattr(self.language_plugin, "statistic_%s" % (name))
+            if 'batch' in function.__dict__:
+                values = function.batch(self.language_plugin, self, unique_sequences)
+            else:
+                values = [function(self, sequence) for sequence in unique_sequences]
+            values = dict(zip(unique_sequences, values))
+            column = [values[sequence] for sequence in sequences]
+            table["statistics"][name] = column
+            if self.reference_sequence is None:
+                continue
+            if 'match' in function.__dict__:
+                table["match_statistics"][name] = [function.match(value, self.reference_statistics[name])
+                                                   for value in column]
+            if 'difference' in function.__dict__:
+                table["difference_statistics"][name] = [function.difference(value, self.reference_statistics[name])
+                                                        for value in column]
+        return table
+
     def clear_statistics(self) -> None:
         """
         Clear all the statistics set previously.
@@ -445,7 +698,7 @@ class WuggyGenerator():
         """
         Clears the sequence cache. Only used by Wuggy internally.
         """
-        self.sequence_cache = []
+        self.sequence_cache.clear()
 
     def list_output_modes(self) -> [str]:
         """
@@ -461,7 +714,7 @@ class WuggyGenerator():
         """
         if name not in self.list_output_modes():
             raise ValueError(f"Output mode {name} is not supported.")
-        self.output_mode = eval("self.language_plugin.output_%s" % (name))
+        self.output_mode = getattr(self.language_plugin, "output_%s" % (name))
 
     def set_attribute_filter(self, name: str) -> None:
         """
@@ -488,8 +741,44 @@ class WuggyGenerator():
         """
         for attribute, reference_sequence in self.attribute_filters.items():
             subchain = self.attribute_subchain if self.attribute_subchain is not None else self.bigramchain
-            self.attribute_subchain = subchain.attribute_filter(
-                reference_sequence, attribute)
+            key = self.__get_subchain_key()
+            if key is not None:
+                if type(reference_sequence[0]) == self.language_plugin.Segment:
+                    values = tuple(segment.__getattribute__(attribute) for segment in reference_sequence)
+                else:
+                    values = tuple(reference_sequence)
+                key += (("attribute", attribute, values),)
+            self.attribute_subchain = self.__get_filtered_subchain(
+                key, lambda: subchain.attribute_filter(reference_sequence, attribute))
+            self.__keyed_attribute_subchain = (key, self.attribute_subchain) if key is not None else None
+
+    def __get_subchain_key(self) -> Optional[tuple]:
+        """
+        Returns the subchain cache key of the chain which filters currently apply to: the filters it was made with,
+        or None if it is not known, such as for an attribute_subchain assigned from outside.
+        Should only be used by WuggyGenerator internally.
+        """
+        if self.attribute_subchain is None:
+            return ()
+        if self.__keyed_attribute_subchain is not None and self.__keyed_attribute_subchain[1] is self.attribute_subchain:
+            return self.__keyed_attribute_subchain[0]
+        return None
+
+    def __get_filtered_subchain(self, key: Optional[tuple], subchain_filter, cache: LRUCache = None):
+        """
+        Returns the subchain cached under key, or filters and caches it with subchain_filter. Without a key, the subchain is not cached.
+        The subchain cache is used unless another cache is given.
+        Cached subchains are shared between sessions, so they must not be changed.
+        Should only be used by WuggyGenerator internally.
+        """
+        cache = cache if cache is not None else self.subchain_cache
+        if key is None or cache is None:
+            return subchain_filter()
+        subchain = cache.get(key)
+        if subchain is None:
+            subchain = subchain_filter()
+            cache[key] = subchain
+        return subchain
 
     def clear_attribute_filters(self) -> None:
         """
@@ -519,8 +808,20 @@ class WuggyGenerator():
             raise Exception("No frequency filter was set")
         reference_sequence, lower, upper = self.frequency_filter
         subchain = self.attribute_subchain if self.attribute_subchain is not None else self.bigramchain
-        self.frequency_subchain = subchain.frequency_filter(
-            reference_sequence, lower, upper)
+        key = self.__get_subchain_key()
+        if key is not None and self.subchain_cache is not None:
+            # Bands which keep the same frequencies at every position give the same subchain, whatever the reference
+            # frequencies are, so the key holds the range of the sorted distinct frequencies kept at every position
+            position_frequencies = self.__get_filtered_subchain(
+                key, subchain.get_position_frequencies, self.position_frequencies_cache)
+            kept_ranges = []
+            for position, frequency in subchain.get_frequencies(reference_sequence).items():
+                frequencies = position_frequencies.get(position, ())
+                kept_ranges.append((bisect_left(frequencies, frequency - lower),
+                                    bisect_right(frequencies, frequency + upper)))
+            key += (("frequency", tuple(kept_ranges)),)
+        self.frequency_subchain = self.__get_filtered_subchain(
+            key, lambda: subchain.frequency_filter(reference_sequence, lower, upper))
 
     @_loaded_language_plugin_required
     def generate_classic(
@@ -528,12 +829,13 @@ class WuggyGenerator():
             ncandidates_per_sequence: int = 10, max_search_time_per_sequence: int = 10,
             subsyllabic_segment_overlap_ratio: Union[Fraction, None] = Fraction(2, 3),
             match_subsyllabic_segment_length: bool = True, match_letter_length: bool = True,
-            output_mode: str = "plain", concentric_search: bool = True) -> [Dict]:
+            output_mode: str = "plain", concentric_search: bool = True, workers: int = 1,
+            seed: int = None) -> [Dict]:
         """
         This is the classic method to generate pseudowords using Wuggy and can be called immediately after loading a language plugin.
         The defaults for this method are similar to those set in the legacy version of Wuggy, resulting in sensible pseudowords.
         This method returns a list of pseudoword matches, including all match and difference statistics (lexicality, ned1, old2, plain_length, deviation statistics...).
-        Beware that this method always clears the sequence cache and all previously set filters.
+        Every call runs in its own session (see session()), so it leaves the filters, statistics and caches of this generator untouched and can run concurrently with other calls.
         Parameters:
             input_sequences: these are the input sequences (words) for which you want to generate pseudowords.
 
@@ -541,7 +843,7 @@ class WuggyGenerator():
 
             max_search_time_per_sequence: this is the maximum time in seconds to search for pseudowords per input sequence.
 
-            subsyllabic_segment_overlap_ratio: this is the Fraction ratio for overlap between subsyllabic segments. The default ensures your pseudowords are very word-like but not easily identifiable as related to an existing word. If set to None, this constraint is not applied.
+            subsyllabic_segment_overlap_ratio: this is the Fraction ratio for overlap between subsyllabic segments. Other numbers, such as 0.5, are read as the closest simple fraction. The default ensures your pseudowords are very word-like but not easily identifiable as related to an existing word. If set to None, this constraint is not applied.
 
             match_subsyllabic_segment_length: determines whether the generated pseudowords must retain the same subsyllabic segment length as the respective input sequence.
 
@@ -549,87 +851,245 @@ class WuggyGenerator():
 
             output_mode: output mode for pseudowords, constricted by the output modes supported by the currently loaded language plugin.
 
-            concentric_search: enable/disable concentric search. Wuggy operates best and fastest when concentric search is enabled. First, the algorithm will try to generate candidates that exactly match the transition frequencies of the reference word. Then the maximal allowed deviation in transition frequencies will increase by powers of 2 (i.e., +/-2, +/-4, +/-8, etc.).
+            concentric_search: enable/disable concentric search. Wuggy operates best and fastest when concentric search is enabled. First, the algorithm will try to generate candidates that exactly match the transition frequencies of the reference word. Then the maximal allowed deviation in transition frequencies will increase by powers of 2 (i.e., +/-2, +/-4, +/-8, etc.). Each wider band only visits the candidates that were not already generated within the previous band, and the search ends early once the band spans every transition.
+
+            workers: the number of processes over which the input sequences are divided. Worker processes are forked from the current process, so they share the loaded language plugin instead of loading it again. Matches are returned in the order of the input sequences and every sequence keeps its own search time limit. If forking is not supported on your platform, the input sequences are processed one after another.
+
+            seed: makes the generated pseudowords reproducible. Every input sequence is searched with its own random number generator, seeded with the seed and the input sequence, so its pseudowords do not depend on the other input sequences or on how they are divided over workers. If None, the global random module is used. Note that a search which is cut short by max_search_time_per_sequence may still stop at a different candidate.
         .. include:: ../../documentation/wuggygenerator/generate_classic.md
         """
-        pseudoword_matches = []
+        if workers > 1 and len(input_sequences) > 1:
+            import multiprocessing
+            if "fork" in multiprocessing.get_all_start_methods():
+                return self.__generate_classic_forked(
+                    input_sequences, workers,
+                    {"ncandidates_per_sequence": ncandidates_per_sequence,
+                     "max_search_time_per_sequence": max_search_time_per_sequence,
+                     "subsyllabic_segment_overlap_ratio": subsyllabic_segment_overlap_ratio,
+                     "match_subsyllabic_segment_length": match_subsyllabic_segment_length,
+                     "match_letter_length": match_letter_length, "output_mode": output_mode,
+                     "concentric_search": concentric_search, "seed": seed})
+            warn("Forking processes is not supported on this platform, input sequences are processed one after another.")
+        return list(self.generate_classic_iter(
+            input_sequences, ncandidates_per_sequence, max_search_time_per_sequence,
+            subsyllabic_segment_overlap_ratio, match_subsyllabic_segment_length, match_letter_length,
+            output_mode, concentric_search, seed))
+
+    @_loaded_language_plugin_required_generator
+    def generate_classic_iter(
+            self, input_sequences: [str],
+            ncandidates_per_sequence: int = 10, max_search_time_per_sequence: int = 10,
+            subsyllabic_segment_overlap_ratio: Union[Fraction, None] = Fraction(2, 3),
+            match_subsyllabic_segment_length: bool = True, match_letter_length: bool = True,
+            output_mode: str = "plain", concentric_search: bool = True,
+            seed: int = None) -> Generator[Dict, None, None]:
+        """
+        Streaming variant of generate_classic, which yields every pseudoword match as soon as it is found, instead of returning them all at the end.
+        The parameters are those of generate_classic, except for workers: input sequences are searched one after another.
+        The search of an input sequence pauses while the caller handles a match, and that time does not count towards max_search_time_per_sequence.
+        Stop iterating at any time to end the search.
+        """
+        session = self.session()
         for input_sequence in input_sequences:
-            pseudoword_matches.extend(
-                self.__generate_classic_inner(
-                    input_sequence,
-                    ncandidates_per_sequence,
-                    max_search_time_per_sequence,
-                    subsyllabic_segment_overlap_ratio,
-                    match_subsyllabic_segment_length,
-                    match_letter_length, output_mode, concentric_search))
-        return pseudoword_matches
+            yield from session.__generate_classic_inner(
+                input_sequence,
+                ncandidates_per_sequence,
+                max_search_time_per_sequence,
+                subsyllabic_segment_overlap_ratio,
+                match_subsyllabic_segment_length,
+                match_letter_length, output_mode, concentric_search, "W",
+                self.__get_sequence_rng(seed, input_sequence))
+
+    async def generate_classic_async(self, input_sequences: [str], executor=None, **options):
+        """
+        Asynchronous variant of generate_classic_iter for asyncio applications, such as web servers streaming pseudowords to their clients.
+        The search runs in executor (a concurrent.futures.Executor, by default the executor of the event loop), so the event loop stays responsive,
+        and every match is yielded as soon as it is found. The options are the keyword arguments of generate_classic_iter.
+        Usage: async for match in generator.generate_classic_async(["car"], ncandidates_per_sequence=5): ...
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        matches = self.generate_classic_iter(input_sequences, **options)
+        try:
+            while True:
+                match = await loop.run_in_executor(executor, next, matches, None)
+                if match is None:
+                    return
+                yield match
+        finally:
+            try:
+                matches.close()
+            except ValueError:
+                # The search was cancelled while running in the executor: it ends once it finds its next match
+                pass
+
+    def __generate_classic_forked(self, input_sequences: [str], workers: int, options: dict) -> [Dict]:
+        """
+        Runs generate_classic for every input sequence in a pool of forked worker processes.
+        Should only be used by WuggyGenerator internally.
+        """
+        import multiprocessing
+        with multiprocessing.get_context("fork").Pool(min(workers, len(input_sequences)),
+                                                      initializer=_initialize_worker, initargs=(self,)) as pool:
+            pseudoword_matches = []
+            for matches in pool.imap(_generate_classic_in_worker,
+                                     [(input_sequence, options) for input_sequence in input_sequences]):
+                pseudoword_matches.extend(matches)
+            return pseudoword_matches
 
     def __generate_classic_inner(
             self, input_sequence: str, ncandidates_per_sequence: int, max_search_time: int,
             subsyllabic_segment_overlap_ratio: Union[Fraction, None],
             match_subsyllabic_segment_length: bool, match_letter_length: bool, output_mode: str,
-            concentric_search: bool = True):
+            concentric_search: bool = True, rejected_lexicality: Optional[str] = "W",
+            rng: random.Random = None) -> Generator[Dict, None, None]:
         """
-        Inner method for generate_classic(), which outputs a list of pseudoword matches for an input sequence.
+        Inner method for generate_classic() and generate_gui(), which yields the pseudoword matches for an input sequence as they are found.
+        Candidates with the rejected lexicality ("W", "N" or None) are skipped.
+        The time the caller spends between matches does not count towards the search time.
         Should only be used by WuggyGenerator internally.
         """
         self.__clear_sequence_cache()
         self.clear_attribute_filters()
         self.clear_frequency_filter()
+        if subsyllabic_segment_overlap_ratio is not None:
+            # Ratios given as floats, such as 2 / 3, are matched as the fraction they approximate
+            subsyllabic_segment_overlap_ratio = Fraction(subsyllabic_segment_overlap_ratio).limit_denominator()
         input_sequence_segments = self.lookup_reference_segments(input_sequence)
         if input_sequence_segments is None:
             raise Exception(
                 f"Sequence {input_sequence} was not found in lexicon {self.current_language_plugin_name}")
         self.set_reference_sequence(input_sequence_segments)
         self.set_output_mode(output_mode)
+        path_constraints = self.__get_path_constraints(
+            subsyllabic_segment_overlap_ratio, match_subsyllabic_segment_length, match_letter_length)
+        pipelines = self.__compile_statistics_pipelines(
+            subsyllabic_segment_overlap_ratio, match_subsyllabic_segment_length, match_letter_length,
+            rejected_lexicality, path_constraints)
         subchain = self.bigramchain
         starttime = time()
-        pseudoword_matches = []
+        nmatches = 0
         frequency_exponent = 1
         if match_subsyllabic_segment_length:
             self.set_attribute_filter("segment_length")
             self.__apply_attribute_filters()
             subchain = self.attribute_subchain
+        # Once the band spans the highest frequency, it can not grow any further
+        max_frequency = subchain.get_max_frequency()
+        previous_subchain = None
         while True:
             if concentric_search:
                 self.set_frequency_filter(
                     2**frequency_exponent, 2**frequency_exponent)
                 frequency_exponent += 1
+                # The frequency filter already cleans the subchain it returns
                 self.apply_frequency_filter()
                 subchain = self.frequency_subchain
-            subchain = subchain.clean(len(self.reference_sequence) - 1)
+            else:
+                subchain = subchain.clean(len(self.reference_sequence) - 1)
             subchain.set_startkeys(self.reference_sequence)
-            for sequence in subchain.generate():
-                # Mandatory statistics before finding a suitable match
-                self.clear_statistics()
-                self.set_statistics(["overlap_ratio", "plain_length", "lexicality"])
+            # Only visit the candidates that were not already generated within the previous band
+            for sequence in subchain.generate(exclude=previous_subchain, constraints=path_constraints, rng=rng):
                 if (time() - starttime) >= max_search_time:
-                    return pseudoword_matches
-                if self.language_plugin.output_plain(sequence) in self.sequence_cache:
+                    return
+                plain_sequence = self.language_plugin.output_plain(sequence)
+                if plain_sequence in self.sequence_cache:
                     continue
                 self.current_sequence = sequence
-                self.apply_statistics()
-                if (not match_subsyllabic_segment_length and match_letter_length and self.difference_statistics["plain_length"] != 0):
+                if not self.__apply_statistics_pipelines(sequence, pipelines):
                     continue
-                if (subsyllabic_segment_overlap_ratio is not None and self.statistics["overlap_ratio"] !=
-                        subsyllabic_segment_overlap_ratio):
-                    continue
-                if self.statistics["lexicality"] == "W":
-                    continue
-                # (Re)apply all statistics only if match is found: else search becomes unnecessarily slow
-                self.set_all_statistics()
-                self.apply_statistics()
-                self.sequence_cache.append(
-                    self.language_plugin.output_plain(sequence))
+                self.sequence_cache.add(plain_sequence)
+                # The statistics are fresh dictionaries for every candidate, so matches need not be copied
                 match = {"word": input_sequence,
                          "segments": input_sequence_segments,
-                         "pseudoword": self.output_mode(sequence)}
-                match.update({"statistics": self.statistics,
-                              "difference_statistics": self.difference_statistics})
+                         "pseudoword": self.output_mode(sequence),
+                         "statistics": self.statistics,
+                         "difference_statistics": self.difference_statistics}
+                nmatches += 1
+                yield_time = time()
+                yield match
+                starttime += time() - yield_time
+                if nmatches >= ncandidates_per_sequence:
+                    return
+            if not concentric_search or 2**(frequency_exponent - 1) >= max_frequency:
+                return
+            previous_subchain = subchain
+
+    @staticmethod
+    def __get_sequence_rng(seed: Optional[int], input_sequence: str) -> Optional[random.Random]:
+        """
+        Returns the random number generator with which an input sequence is searched for a seed, or None without a seed.
+        Should only be used by WuggyGenerator internally.
+        """
+        if seed is None:
+            return None
+        return random.Random(f"{seed}\t{input_sequence}")
 
-                pseudoword_matches.append(copy.deepcopy(match))
-                if len(pseudoword_matches) >= ncandidates_per_sequence:
-                    return pseudoword_matches
+    def __get_path_constraints(
+            self, subsyllabic_segment_overlap_ratio: Union[Fraction, None], match_subsyllabic_segment_length: bool,
+            match_letter_length: bool) -> Optional[PathConstraints]:
+        """
+        Returns the constraints on overlap and letter length of a generate_classic or generate_gui request, which the bigramchain walk enforces
+        itself, or None if there are none. Plugins which redefine these statistics (or the plain output they are based on) are not constrained
+        during the walk, since the constraints follow the definitions of BaseLanguagePlugin.
+        Should only be used by WuggyGenerator internally.
+        """
+        plugin_class = type(self.language_plugin)
+        if any(getattr(plugin_class, name) is not getattr(BaseLanguagePlugin, name) for name in
+               ("statistic_overlap", "statistic_overlap_ratio", "statistic_plain_length", "output_plain")):
+            return None
+        overlap = letters = None
+        if subsyllabic_segment_overlap_ratio is not None:
+            overlap = Fraction(subsyllabic_segment_overlap_ratio) * (len(self.reference_sequence) - 2)
+            # A ratio which no number of overlapping segments gives can not be met by any path
+            overlap = int(overlap) if overlap.denominator == 1 else -1
+        if not match_subsyllabic_segment_length and match_letter_length:
+            letters = len(self.language_plugin.output_plain(self.reference_sequence))
+        if overlap is None and letters is None:
+            return None
+        return PathConstraints(self.reference_sequence, overlap, letters)
+
+    def __compile_statistics_pipelines(
+            self, subsyllabic_segment_overlap_ratio: Union[Fraction, None], match_subsyllabic_segment_length: bool,
+            match_letter_length: bool, rejected_lexicality: Optional[str],
+            path_constraints: PathConstraints = None) -> (StatisticsPipeline, StatisticsPipeline):
+        """
+        Compiles the statistics of a generate_classic or generate_gui request against the current reference sequence:
+        a pipeline of the cheap statistics which reject candidates, and a pipeline of all other statistics, which only runs for matches.
+        Overlap and letter length do not reject candidates when the walk already enforces them through path_constraints.
+        Should only be used by WuggyGenerator internally.
+        """
+        rejections = {}
+        if (not match_subsyllabic_segment_length and match_letter_length
+                and (path_constraints is None or path_constraints.letters is None)):
+            reference_plain_length = self.reference_statistics["plain_length"]
+            rejections["plain_length"] = lambda plain_length: plain_length != reference_plain_length
+        if subsyllabic_segment_overlap_ratio is not None and (path_constraints is None or path_constraints.overlap is None):
+            rejections["overlap_ratio"] = lambda overlap_ratio: overlap_ratio != subsyllabic_segment_overlap_ratio
+        if rejected_lexicality is not None:
+            rejections["lexicality"] = lambda lexicality: lexicality == rejected_lexicality
+        screening = StatisticsPipeline(self, ["overlap_ratio", "plain_length", "lexicality"],
+                                       self.reference_statistics, rejections)
+        remaining = StatisticsPipeline(self, [name for name in self.supported_statistics if name not in screening.names],
+                                       self.reference_statistics)
+        return screening, remaining
+
+    def __apply_statistics_pipelines(self, sequence, pipelines: (StatisticsPipeline, StatisticsPipeline)) -> bool:
+        """
+        Runs the pipelines compiled by __compile_statistics_pipelines for a candidate sequence.
+        Returns False if the candidate is rejected, else stores its statistics on the generator and returns True.
+        Should only be used by WuggyGenerator internally.
+        """
+        screening, remaining = pipelines
+        statistics = {}
+        difference_statistics = {}
+        if not screening.run(sequence, statistics, self.match_statistics, difference_statistics):
+            return False
+        # All other statistics are only computed for a match: else search becomes unnecessarily slow
+        remaining.run(sequence, statistics, self.match_statistics, difference_statistics)
+        self.statistics = statistics
+        self.difference_statistics = difference_statistics
+        return True
 
     @_loaded_language_plugin_required
     def generate_gui(
@@ -638,7 +1098,7 @@ class WuggyGenerator():
             subsyllabic_segment_overlap_ratio: Union[Fraction, None] = Fraction(2, 3),
             match_subsyllabic_segment_length: bool = True, match_letter_length: bool = True,
             output_mode: str = "plain", concentric_search: bool = True,
-            output_type: str = "pseudowords") -> [Dict]:
+            output_type: str = "pseudowords", seed: int = None) -> [Dict]:
         """
         Variant of generate_classic tailored for GUI use.
         Identical to generate_classic except for the output_type parameter, which controls
@@ -647,92 +1107,42 @@ class WuggyGenerator():
             "words"       — only real words
             "both"        — no lexicality filter
         Also supports injecting a pre-syllabified form for words not in the lexicon via
-        the lookup_lexicon (set externally before calling).
+        the lookup_lexicon (set externally before calling). The loaded lookup_lexicon is read-only and shared,
+        so inject words by assigning e.g. collections.ChainMap({word: segments}, generator.lookup_lexicon).
+        The seed makes the generated pseudowords reproducible, as in generate_classic.
         """
+        session = self.session()
         pseudoword_matches = []
         for input_sequence in input_sequences:
             pseudoword_matches.extend(
-                self.__generate_gui_inner(
+                session.__generate_classic_inner(
                     input_sequence,
                     ncandidates_per_sequence,
                     max_search_time_per_sequence,
                     subsyllabic_segment_overlap_ratio,
                     match_subsyllabic_segment_length,
                     match_letter_length, output_mode, concentric_search,
-                    output_type))
+                    {"pseudowords": "W", "words": "N"}.get(output_type),
+                    self.__get_sequence_rng(seed, input_sequence)))
         return pseudoword_matches
 
-    def __generate_gui_inner(
-            self, input_sequence: str, ncandidates_per_sequence: int, max_search_time: int,
-            subsyllabic_segment_overlap_ratio: Union[Fraction, None],
-            match_subsyllabic_segment_length: bool, match_letter_length: bool, output_mode: str,
-            concentric_search: bool, output_type: str):
-        self.__clear_sequence_cache()
-        self.clear_attribute_filters()
-        self.clear_frequency_filter()
-        input_sequence_segments = self.lookup_reference_segments(input_sequence)
-        if input_sequence_segments is None:
-            raise Exception(
-                f"Sequence {input_sequence} was not found in lexicon {self.current_language_plugin_name}")
-        self.set_reference_sequence(input_sequence_segments)
-        self.set_output_mode(output_mode)
-        subchain = self.bigramchain
-        starttime = time()
-        pseudoword_matches = []
-        frequency_exponent = 1
-        if match_subsyllabic_segment_length:
-            self.set_attribute_filter("segment_length")
-            self.__apply_attribute_filters()
-            subchain = self.attribute_subchain
-        while True:
-            if concentric_search:
-                self.set_frequency_filter(
-                    2**frequency_exponent, 2**frequency_exponent)
-                frequency_exponent += 1
-                self.apply_frequency_filter()
-                subchain = self.frequency_subchain
-            subchain = subchain.clean(len(self.reference_sequence) - 1)
-            subchain.set_startkeys(self.reference_sequence)
-            for sequence in subchain.generate():
-                self.clear_statistics()
-                self.set_statistics(["overlap_ratio", "plain_length", "lexicality"])
-                if (time() - starttime) >= max_search_time:
-                    return pseudoword_matches
-                if self.language_plugin.output_plain(sequence) in self.sequence_cache:
-                    continue
-                self.current_sequence = sequence
-                self.apply_statistics()
-                if (not match_subsyllabic_segment_length and match_letter_length and self.difference_statistics["plain_length"] != 0):
-                    continue
-                if (subsyllabic_segment_overlap_ratio is not None and self.statistics["overlap_ratio"] !=
-                        subsyllabic_segment_overlap_ratio):
-                    continue
-                lexicality = self.statistics["lexicality"]
-                if output_type == "pseudowords" and lexicality == "W":
-                    continue
-                if output_type == "words" and lexicality == "N":
-                    continue
-                self.set_all_statistics()
-                self.apply_statistics()
-                self.sequence_cache.append(
-                    self.language_plugin.output_plain(sequence))
-                match = {"word": input_sequence,
-                         "segments": input_sequence_segments,
-                         "pseudoword": self.output_mode(sequence)}
-                match.update({"statistics": self.statistics,
-                              "difference_statistics": self.difference_statistics})
-                pseudoword_matches.append(copy.deepcopy(match))
-                if len(pseudoword_matches) >= ncandidates_per_sequence:
-                    return pseudoword_matches
-
     @_loaded_language_plugin_required_generator
-    def generate_advanced(self, clear_cache: bool = True) -> Union[Generator[str, None, None],
-                                                                   Generator[tuple, None, None]]:
+    def generate_advanced(self, clear_cache: bool = True, sample: bool = False, seed: int = None,
+                          max_repeated_samples: int = 10000) -> Union[Generator[str, None, None], Generator[tuple, None, None]]:
         """
         Creates a custom generator which can be iterated to return generated pseudowords.
         The generator's settings, such as output statistics, should be set by you before calling this method.
         If attributes such as \"output_mode\" are not set, sensible defaults are used.
         Note that this method is for advanced users and may result in unexpected results if handled incorrectly.
+        Sequences which were already generated are skipped using the sequence cache. For unbounded streaming runs, assign a SequenceCache with a bloom_capacity to the sequence_cache property to keep its memory use constant.
+        Parameters:
+            clear_cache: determines whether the sequence cache is cleared first, so that sequences generated by earlier calls can be generated again.
+
+            sample: determines whether candidates are drawn at random in proportion to their transition frequencies, instead of enumerating every candidate once in a random depth first order. Sampling spreads the first candidates over many more segments, and only ends once the candidates run out (see max_repeated_samples): stop iterating once you have enough pseudowords.
+
+            seed: makes the generated candidates reproducible, whether they are sampled or enumerated. If None, enumeration uses the global random module.
+
+            max_repeated_samples: when sampling, the number of draws in a row which only give sequences that were already generated, after which the candidates are considered exhausted and the generator ends.
         .. include:: ../../documentation/wuggygenerator/generate_advanced.md
         """
         if clear_cache:
@@ -755,15 +1165,21 @@ class WuggyGenerator():
             warn(
                 "No reference sequence was set. Ignore this message if this was intentional.")
             subchain.set_startkeys()
-        for sequence in subchain.generate():
-            if self.language_plugin.output_plain(sequence) in self.sequence_cache:
-                pass
-            else:
-                self.sequence_cache.append(
-                    self.language_plugin.output_plain(sequence))
+        rng = random.Random(seed) if sample or seed is not None else None
+        sequences = subchain.sample(rng) if sample else subchain.generate(rng=rng)
+        repeated_samples = 0
+        for sequence in sequences:
+            if self.sequence_cache.add(self.language_plugin.output_plain(sequence)):
+                repeated_samples = 0
                 self.current_sequence = sequence
                 self.apply_statistics()
                 yield self.output_mode(sequence)
+            elif sample:
+                # Samples are drawn with replacement, so without this bound a chain whose sequences were all generated
+                # would be sampled forever
+                repeated_samples += 1
+                if repeated_samples >= max_repeated_samples:
+                    return
 
     def export_classic_pseudoword_matches_to_csv(
             self, pseudoword_matches: [Dict],
@@ -806,6 +1222,7 @@ class WuggyGenerator():
             flatten_nested_dict_values(dictionary)
             return dict_vals
 
+        from csv import writer
         with open(csv_path, "w", newline='') as csvfile:
             file_writer = writer(csvfile)
             file_writer.writerow(get_csv_headers(pseudoword_matches[0]))
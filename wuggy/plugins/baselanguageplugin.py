@@ -2,8 +2,7 @@
 from collections import namedtuple
 from fractions import Fraction
 
-# Pylint may report no-member error due to C extension
-import Levenshtein
+from ..utilities.neighborindex import NeighborIndex
 
 
 def compute_difference(gen_stat, ref_stat):
@@ -32,6 +31,28 @@ def difference(function):
     return function
 
 
+def batch(batch_function):
+    """
+    Attaches a function which computes a statistic for a whole list of generated sequences at once,
+    called as batch_function(plugin, generator, generated_sequences) and returning one value per sequence.
+    Statistics without one are computed sequence by sequence in batches.
+    """
+    def decorator(function):
+        function.batch = batch_function
+        return function
+    return decorator
+
+
+def compute_old20_batch(plugin, generator, generated_sequences):
+    return generator.neighbor_index.old_batch(
+        [plugin.output_plain(sequence) for sequence in generated_sequences], 20)
+
+
+def compute_ned1_batch(plugin, generator, generated_sequences):
+    return [len(neighbors) for neighbors in generator.neighbor_index.neighbors_at_distance_batch(
+        [plugin.output_plain(sequence) for sequence in generated_sequences], 1)]
+
+
 class BaseLanguagePlugin():
     separator = u'\t'
     subseparator = u'|'
@@ -124,21 +145,30 @@ class BaseLanguagePlugin():
     @match
     def statistic_lexicality(self, generator, generated_sequence):
         candidate = self.output_plain(generated_sequence)
-        if candidate in generator.word_lexicon[candidate[0], len(candidate)]:
+        if candidate in generator.word_lexicon.get((candidate[0], len(candidate)), ()):
             return "W"
         else:
             return "N"
 
     @difference
     def _distance(self, source, target):
+        # Pylint may report no-member error due to C extension
+        import Levenshtein
         return Levenshtein.distance(source, target)
 
     def _old(self, source, lexicon, n):
+        """
+        Returns OLD-n, the mean Levenshtein distance from source to its n closest words in the lexicon.
+        The lexicon is either a NeighborIndex, such as generator.neighbor_index, or any iterable of words.
+        """
+        if isinstance(lexicon, NeighborIndex):
+            return lexicon.old(source, n)
         distances = (distance for neighbor,
                      distance in self._neighbors(source, lexicon, n))
         return sum(distances) / float(n)
 
     def _neighbors(self, source, lexicon, n):
+        import Levenshtein
         neighbors = []
         for target in lexicon:
             neighbors.append((target, Levenshtein.distance(source, target)))
@@ -146,6 +176,9 @@ class BaseLanguagePlugin():
         return neighbors[0:n]
 
     def _neighbors_at_distance(self, source, lexicon, distance):
+        if isinstance(lexicon, NeighborIndex):
+            return lexicon.neighbors_at_distance(source, distance)
+        import Levenshtein
         neighbors = []
         for target in lexicon:
             if abs(len(target) - len(source)) > distance:
@@ -156,15 +189,17 @@ class BaseLanguagePlugin():
 
     @match
     @difference
+    @batch(compute_old20_batch)
     def statistic_old20(self, generator, generated_sequence):
-        return self._old(self.output_plain(generated_sequence), generator.neighbor_lexicon, 20)
+        return self._old(self.output_plain(generated_sequence), generator.neighbor_index, 20)
 
     @match
     @difference
+    @batch(compute_ned1_batch)
     def statistic_ned1(self, generator, generated_sequence):
         return len(self._neighbors_at_distance(
             self.output_plain(generated_sequence),
-            generator.neighbor_lexicon, 1))
+            generator.neighbor_index, 1))
 
     @difference
     def statistic_transition_frequencies(self, generator, generated_sequence):
@@ -1,15 +1,137 @@
+import pickle
 import random
+import sys
+from array import array
+from bisect import bisect_right
 from collections import defaultdict, namedtuple
+from itertools import accumulate
 
 Link = namedtuple('Link', ['position', 'value'])
 
+# Bump whenever the layout written by BigramChain.dump_compiled changes.
+COMPILED_FORMAT_VERSION = 1
+
+
+def serialize_segments(segments, language_plugin):
+    """
+    Returns the segments in a picklable form which does not depend on the plugin module: the names under which
+    the segment types are found on the language plugin, and a (type index, fields) pair per segment.
+    Returns None if a segment type can not be found on the language plugin.
+    """
+    segment_types = []
+    for segment in segments:
+        if type(segment) not in segment_types:
+            segment_types.append(type(segment))
+    segment_type_names = []
+    for segment_type in segment_types:
+        names = [name for name in dir(type(language_plugin))
+                 if getattr(type(language_plugin), name) is segment_type]
+        if not names:
+            return None
+        segment_type_names.append(names[0])
+    return segment_type_names, [(segment_types.index(type(segment)), tuple(segment)) for segment in segments]
+
+
+def deserialize_segments(segment_type_names, serialized_segments, language_plugin):
+    """
+    Rebuilds segments serialized by serialize_segments, or returns None if the language plugin lacks a segment type.
+    """
+    try:
+        segment_types = [getattr(language_plugin, name) for name in segment_type_names]
+    except AttributeError:
+        return None
+    return [segment_types[type_index](*fields) for type_index, fields in serialized_segments]
+
+
+def read_compiled(path, tag, language_plugin):
+    """
+    Read a file written by BigramChain.dump_compiled.
+    Returns the interned segments and the flat transition arrays (positions, key ids,
+    next key ids, frequencies), or None if the file can not be used for the given tag.
+    """
+    try:
+        with open(path, 'rb') as compiled_file:
+            compiled = pickle.load(compiled_file)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    if not isinstance(compiled, dict) or compiled.get('format') != COMPILED_FORMAT_VERSION \
+            or compiled.get('tag') != tag:
+        return None
+    segments = deserialize_segments(compiled['segment_types'], compiled['segments'], language_plugin)
+    if segments is None:
+        return None
+    return (segments, compiled['positions'], compiled['keys'], compiled['next_keys'],
+            compiled['frequencies'])
+
+
+def _draw(rng, cumulative_weights):
+    """
+    Returns a random index into cumulative weights, with probability proportional to the weight of the index.
+    """
+    # min() guards against rounding up to the total weight
+    return min(bisect_right(cumulative_weights, rng.random() * cumulative_weights[-1]), len(cumulative_weights) - 1)
+
+
+class PathConstraints():
+    """
+    Structural constraints which generate checks while it walks a chain, so that it skips every subtree
+    in which no path can satisfy them, instead of generating those paths only to reject them afterwards.
+    Both are counted over all positions of the reference sequence but the first and the last:
+        overlap: the number of positions at which a path has the same segment as the reference sequence.
+        letters: the total number of letters of the segments of a path.
+    Either can be None to leave it unconstrained.
+    """
+
+    def __init__(self, reference_sequence, overlap: int = None, letters: int = None):
+        self.reference_sequence = reference_sequence
+        self.overlap = overlap
+        self.letters = letters
+
+    def prepare(self, letter_ranges: dict):
+        """
+        Returns the functions a walk uses to check its paths, given the (fewest, most) letters of the segments
+        at each position of the chain: advance(state, position, segment) returns the state of a path extended
+        with a segment, or None if no completion of it can satisfy the constraints, and complete(state) tells
+        whether a finished path satisfies them. The state of an empty path is (0, 0).
+        """
+        reference_sequence = self.reference_sequence
+        target_overlap = self.overlap
+        target_letters = self.letters
+        last = len(reference_sequence) - 2
+        # The fewest and most letters the positions after each position can still add
+        fewest_after = [0] * (last + 2)
+        most_after = [0] * (last + 2)
+        for position in range(last, 0, -1):
+            fewest, most = letter_ranges.get(position, (0, 0))
+            fewest_after[position - 1] = fewest_after[position] + fewest
+            most_after[position - 1] = most_after[position] + most
+
+        def advance(state, position, segment):
+            overlap, letters = state
+            if 1 <= position <= last:
+                overlap += segment == reference_sequence[position]
+                letters += len(segment.letters)
+            if target_overlap is not None and not overlap <= target_overlap <= overlap + max(0, last - position):
+                return None
+            if target_letters is not None:
+                after = min(position, last + 1)
+                if not letters + fewest_after[after] <= target_letters <= letters + most_after[after]:
+                    return None
+            return overlap, letters
+
+        def complete(state):
+            overlap, letters = state
+            return ((target_overlap is None or overlap == target_overlap)
+                    and (target_letters is None or letters == target_letters))
+        return advance, complete
+
 
 class BigramChain(defaultdict):
     """
     A dictionary storing the next possible value, given a list of input sequences.
     """
 
-    def __init__(self, language_plugin, data=None, encoding='utf-8', size=100, cutoff=1, token=False):
+    def __init__(self, language_plugin, data=None, encoding='utf-8', size=100, cutoff=1, token=False, rng=None):
         defaultdict.__init__(self, dict)
         self.language_plugin = language_plugin
         try:
@@ -17,11 +139,16 @@ class BigramChain(defaultdict):
         except AttributeError:
             self.hidden_sequence = False
         if data != None:
-            self.load(data, size=size, cutoff=cutoff, token=token)
+            self.load(data, size=size, cutoff=cutoff, token=token, rng=rng)
         self.startkeys = []
         self.limit_frequencies = {}
 
-    def load(self, datafile, size=100, cutoff=1, token=False):
+    def load(self, datafile, size=100, cutoff=1, token=False, rng=None):
+        """
+        Loads the transitions of the sequences in datafile. When size is below 100, only about size percent of
+        the sequences are loaded, chosen with rng (a random.Random, or the random module if None).
+        """
+        rng = rng if rng is not None else random
         lines = datafile.readlines()
         for i, line in enumerate(lines):
             fields = line.strip('\n\t').split(self.language_plugin.separator)
@@ -31,7 +158,7 @@ class BigramChain(defaultdict):
             sequence = (self.language_plugin.transform(
                 input_sequence, frequency))
             n = len(sequence.representation)
-            if frequency >= cutoff and random.randint(1, 100) <= size:
+            if frequency >= cutoff and (size >= 100 or rng.randint(1, 100) <= size):
                 for j in range(n):
                     key = Link(j, sequence.representation[j])
                     if j+1 < n:
@@ -43,6 +170,89 @@ class BigramChain(defaultdict):
         datafile.close()
         self.set_startkeys()
 
+    def flatten(self):
+        """
+        Returns the transition table as interned segments and flat arrays: one entry per
+        transition, holding its position, the segment ids on both ends and its frequency.
+        Transitions are listed in insertion order, so rebuilding a chain from them generates
+        in the same order.
+        """
+        segment_ids = {}
+        segments = []
+        positions = array('l')
+        key_ids = array('l')
+        next_key_ids = array('l')
+        frequencies = []
+
+        def intern(segment):
+            identity = (type(segment), segment)
+            if identity not in segment_ids:
+                segment_ids[identity] = len(segments)
+                segments.append(segment)
+            return segment_ids[identity]
+
+        for key, nextkeys in self.items():
+            for nextkey, frequency in nextkeys.items():
+                positions.append(key.position)
+                key_ids.append(intern(key.value))
+                next_key_ids.append(intern(nextkey.value))
+                frequencies.append(frequency)
+        if all(isinstance(frequency, int) for frequency in frequencies):
+            frequencies = array('q', frequencies)
+        else:
+            frequencies = array('d', frequencies)
+        return segments, positions, key_ids, next_key_ids, frequencies
+
+    def dump_compiled(self, path, tag):
+        """
+        Write the transition table to a binary file which can be read back by load_compiled.
+        The tag is stored alongside the table and should identify the data the chain was built from.
+        Returns False if the segments can not be resolved on the language plugin.
+        The file is written to a temporary file next to it first and then moved into place, so processes which
+        load the chain at the same time never read a partially written file.
+        """
+        import os
+        import tempfile
+        segments, positions, key_ids, next_key_ids, frequencies = self.flatten()
+        serialized = serialize_segments(segments, self.language_plugin)
+        if serialized is None:
+            return False
+        segment_type_names, serialized_segments = serialized
+        descriptor, temporary_path = tempfile.mkstemp(
+            prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path) or ".")
+        try:
+            with os.fdopen(descriptor, 'wb') as compiled_file:
+                pickle.dump({'format': COMPILED_FORMAT_VERSION, 'tag': tag,
+                             'segment_types': segment_type_names,
+                             'segments': serialized_segments,
+                             'positions': positions, 'keys': key_ids, 'next_keys': next_key_ids,
+                             'frequencies': frequencies},
+                            compiled_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_path, path)
+        except BaseException:
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+            raise
+        return True
+
+    def load_compiled(self, path, tag):
+        """
+        Restore the transition table from a file written by dump_compiled.
+        Returns False, leaving the chain untouched, if the file is missing, unreadable,
+        or was written for a different tag or format version.
+        """
+        compiled = read_compiled(path, tag, self.language_plugin)
+        if compiled is None:
+            return False
+        segments, positions, key_ids, next_key_ids, frequencies = compiled
+        for position, key_id, next_key_id, frequency in zip(
+                positions, key_ids, next_key_ids, frequencies):
+            self[Link(position, segments[key_id])][Link(position+1, segments[next_key_id])] = frequency
+        self.set_startkeys()
+        return True
+
     def set_startkeys(self, reference_sequence=None, fields=None):
         if fields == None:
             fields = self.language_plugin.default_fields
@@ -60,11 +270,8 @@ class BigramChain(defaultdict):
         for position in range(len(reference_sequence)-1):
             key = Link(position, reference_sequence[position])
             nextkey = Link(position+1, reference_sequence[position+1])
-            try:
-                frequency = self[key][nextkey]
-            except KeyError:
-                frequency = 0
-            frequencies[position] = frequency
+            # Indexing would insert missing keys into the chain, which may be shared between sessions
+            frequencies[position] = self.get(key, {}).get(nextkey, 0)
         return frequencies
 
     def build_limit_frequencies(self, fields):
@@ -85,35 +292,29 @@ class BigramChain(defaultdict):
         self.limit_frequencies[tuple(fields)] = limits
 
     def frequency_filter(self, reference_sequence, lower, upper, kind='dev'):
-        result = BigramChain(self.language_plugin)
-        frequencies = self.get_frequencies(reference_sequence)
-        for key, nextkeys in self.items():
-            try:
-                if kind == 'dev':
-                    minfreq = frequencies[key.position]-lower
-                    maxfreq = frequencies[key.position]+upper
-                elif kind == 'limit':
-                    minfreq = lower
-                    maxfreq = upper
-            except:
-                pass
-            else:
-                for nextkey, frequency in nextkeys.items():
-                    if minfreq <= frequency <= maxfreq:
-                        result[key][nextkey] = frequency
-        result = result.clean(len(reference_sequence)-1)
+        """
+        Returns a cleaned chain with the transitions whose frequency lies within lower below and upper above the frequency
+        of the reference transition at the same position (kind 'dev'), or between lower and upper (kind 'limit').
+        The transitions are filtered while cleaning, so the chain is only copied once.
+        """
+        if kind == 'dev':
+            bounds = dict((position, (frequency - lower, frequency + upper))
+                          for position, frequency in self.get_frequencies(reference_sequence).items())
+
+        def keep(key, nextkey, frequency):
+            if kind != 'dev':
+                return lower <= frequency <= upper
+            # Positions the reference sequence does not reach keep no transitions
+            return key.position in bounds and bounds[key.position][0] <= frequency <= bounds[key.position][1]
+
+        result = self.clean(len(reference_sequence)-1, keep)
         result.set_startkeys()
         return result
 
     def segmentset_filter(self, reference_sequence, segmentset):
         segmentset = segmentset.union(set(('^', '$')))
-        result = BigramChain(self.language_plugin)
-        for key, nextkeys in self.items():
-            if key.value.letters in segmentset:
-                for nextkey, frequency in nextkeys.items():
-                    if nextkey.value.letters in segmentset:
-                        result[key][nextkey] = frequency
-        result = result.clean(len(reference_sequence)-1)
+        result = self.clean(len(reference_sequence)-1, lambda key, nextkey, frequency:
+                            key.value.letters in segmentset and nextkey.value.letters in segmentset)
         result.set_startkeys()
         return result
 
@@ -136,37 +337,180 @@ class BigramChain(defaultdict):
                     pass
         return result
 
-    def clean(self, maxpos):
+    def clean(self, maxpos, keep=None):
         """
         Remove chains that can not be completed.
+        A single backward pass over the positions keeps the transitions that lead to position maxpos,
+        then a single forward pass drops the keys that can not be reached from position 0.
+        The remaining keys and transitions keep their original order.
+        If keep is given, only the transitions for which keep(key, nextkey, frequency) is true are kept,
+        which filters and cleans the chain without an intermediate copy.
         """
+        keys_by_position = defaultdict(list)
+        for key in self.keys():
+            keys_by_position[key.position].append(key)
+        completable = {}
+        for position in sorted(keys_by_position, reverse=True):
+            for key in keys_by_position[position]:
+                nextkeys = dict((nextkey, frequency) for nextkey, frequency in self[key].items()
+                                if (nextkey.position == maxpos or nextkey in completable)
+                                and (keep is None or keep(key, nextkey, frequency)))
+                if nextkeys:
+                    completable[key] = nextkeys
+        reachable = set(key for key in keys_by_position.get(0, []) if key in completable)
+        for position in sorted(keys_by_position):
+            for key in keys_by_position[position]:
+                if key in reachable and key in completable:
+                    reachable.update(completable[key])
         result = BigramChain(self.language_plugin)
+        for key in self.keys():
+            if key in reachable and key in completable:
+                result[key] = completable[key]
+        return result
+
+    def nbytes(self):
+        """
+        Returns an estimate of the bytes held by the dictionaries of the chain.
+        Keys, segments and frequencies are not counted, since a filtered chain shares them with the chain it was filtered from.
+        """
+        return sys.getsizeof(self) + sum(sys.getsizeof(nextkeys) for nextkeys in self.values())
+
+    def get_max_frequency(self):
+        return max((frequency for nextkeys in self.values() for frequency in nextkeys.values()),
+                   default=0)
+
+    def get_position_frequencies(self):
+        """
+        Returns the sorted distinct frequencies of the transitions from every position of the chain.
+        """
+        frequencies = defaultdict(set)
         for key, nextkeys in self.items():
-            for nextkey, frequency in nextkeys.items():
-                if nextkey in self or nextkey.position == maxpos:
-                    result[key][nextkey] = frequency
-        if len(self) == len(result):
-            return result
-        else:
-            return result.clean(maxpos)
+            frequencies[key.position].update(nextkeys.values())
+        return dict((position, sorted(values)) for position, values in frequencies.items())
 
-    def generate(self, startkeys=None):
+    def generate(self, startkeys=None, exclude=None, constraints: PathConstraints = None, rng=None):
+        """
+        Yields all paths through the chain, starting from the given start keys.
+        If exclude is given (typically the chain of the previous, narrower band of a concentric search),
+        paths of which every transition also lies in exclude are skipped, so that only new paths are produced.
+        If constraints are given, only the paths which satisfy them are produced.
+        The walk is depth first, with the start keys and the next keys of every key visited in random order,
+        shuffled with rng (a random.Random, or the random module if None).
+        """
+        rng = rng if rng is not None else random
         if startkeys is None:
             startkeys = self.startkeys
-        startkeys = list(startkeys.items())
-        random.shuffle(startkeys)
-        startkeys = dict(startkeys)
+        fresh_keys = None
+        if exclude is not None:
+            fresh_keys = self.__get_fresh_keys(exclude)
+            startkeys = [key for key in startkeys if key in fresh_keys]
+        startkeys = list(startkeys)
+        rng.shuffle(startkeys)
         if len(self) > 0:
-            for key in startkeys:
-                if key not in self:
-                    yield (key.value,)
-                else:
-                    next_keys = self[key]
-                    for result in self.generate(next_keys):
-                        yield (key.value,)+result
+            yield from self.__walk(startkeys, exclude, fresh_keys, constraints, rng)
         else:
             raise Exception('LinkError')
 
+    def __walk(self, startkeys, exclude, fresh_keys, constraints, rng):
+        """
+        Walks the paths from the start keys depth first, with an explicit stack instead of nested generators.
+        Every stack frame holds the path so far, its constraint state and an iterator over the (key, fresh) pairs
+        still to visit after it.
+        A fresh key, only visited when exclude is given, may only continue along transitions which lead to a path
+        with at least one transition that is not in exclude. Once such a transition is taken, the rest of the path
+        is generated without restrictions.
+        Keys which make the path violate the constraints are skipped before their next keys are shuffled.
+        """
+        advance = complete = None
+        if constraints is not None:
+            advance, complete = constraints.prepare(self.__get_letter_ranges())
+        stack = [((), (0, 0), iter([(key, exclude is not None) for key in startkeys]))]
+        while stack:
+            path, state, keys = stack[-1]
+            key, fresh = next(keys, (None, False))
+            if key is None:
+                stack.pop()
+                continue
+            if advance is not None:
+                next_state = advance(state, key.position, key.value)
+                if next_state is None:
+                    continue
+            else:
+                next_state = state
+            if fresh:
+                next_keys = list(self[key])
+                rng.shuffle(next_keys)
+                excluded_nextkeys = exclude.get(key, {})
+                stack.append((path + (key.value,), next_state, iter([
+                    (nextkey, nextkey in excluded_nextkeys) for nextkey in next_keys
+                    if nextkey not in excluded_nextkeys or nextkey in fresh_keys])))
+            elif key not in self:
+                if complete is None or complete(next_state):
+                    yield path + (key.value,)
+            else:
+                next_keys = list(self[key])
+                rng.shuffle(next_keys)
+                stack.append((path + (key.value,), next_state, iter([(nextkey, False) for nextkey in next_keys])))
+
+    def __get_letter_ranges(self):
+        """
+        Returns the fewest and the most letters of the segments at every position of the chain.
+        """
+        letter_ranges = {}
+        for key, nextkeys in self.items():
+            for link in (key, *nextkeys):
+                letters = len(link.value.letters)
+                fewest, most = letter_ranges.get(link.position, (letters, letters))
+                letter_ranges[link.position] = (min(fewest, letters), max(most, letters))
+        return letter_ranges
+
+    def __get_fresh_keys(self, exclude):
+        """
+        Returns the keys from which a path can be completed using at least one transition that is not in exclude.
+        """
+        fresh_keys = set()
+        for key in sorted(self.keys(), key=lambda key: key.position, reverse=True):
+            excluded_nextkeys = exclude.get(key, {})
+            if any(nextkey not in excluded_nextkeys or nextkey in fresh_keys for nextkey in self[key]):
+                fresh_keys.add(key)
+        return fresh_keys
+
+    def sample(self, rng=None, startkeys=None):
+        """
+        Yields paths drawn at random from the start keys, without end, each with a probability proportional
+        to the product of its transition frequencies. Paths are drawn with replacement, so they can repeat.
+        The completion weight of every key (the summed frequency products of the paths from that key) is computed
+        once per call, from the last position backwards, and kept as cumulative weights of its next keys,
+        so every draw costs one bisection per position.
+        Draws are made with rng (a random.Random, or the random module if None), like generate.
+        Pass a random.Random as rng to make the draws reproducible.
+        """
+        rng = rng if rng is not None else random
+        if startkeys is None:
+            startkeys = self.startkeys
+        completion_weights = {}
+        cumulative_weights = {}
+        for key in sorted(self.keys(), key=lambda key: key.position, reverse=True):
+            next_keys = list(self[key].items())
+            weights = list(accumulate(frequency * completion_weights.get(nextkey, 1.0)
+                                      for nextkey, frequency in next_keys))
+            # A key without next keys is a dead end, which no path is drawn through
+            completion_weights[key] = weights[-1] if weights else 0.0
+            if weights:
+                cumulative_weights[key] = ([nextkey for nextkey, _ in next_keys], weights)
+        startkeys = list(startkeys)
+        start_weights = list(accumulate(completion_weights.get(key, 1.0) for key in startkeys))
+        if not start_weights or start_weights[-1] <= 0:
+            return
+        while True:
+            key = startkeys[_draw(rng, start_weights)]
+            path = [key.value]
+            while key in cumulative_weights:
+                next_keys, weights = cumulative_weights[key]
+                key = next_keys[_draw(rng, weights)]
+                path.append(key.value)
+            yield tuple(path)
+
     def display(self):
         for key, nextkeys in sorted(self.items(), key=lambda x: x):
             print('***', key.position, key.value)
@@ -0,0 +1,487 @@
+import random
+from itertools import accumulate
+
+import numpy as np
+
+from .bigramchain import _draw, read_compiled
+
+
+class TransitionTable():
+    """
+    A read-only transition table in CSR layout, shared by all CompactBigramChain views.
+    Each segment is interned to an integer id, and each chain key (a position and a segment)
+    to a node id. Nodes are sorted by position, and the transitions leaving node i are stored in
+    targets[offsets[i]:offsets[i+1]] (with matching frequencies) in the order they were first seen.
+    Because of this, the transitions of every position form one contiguous slice,
+    given by position_offsets.
+    """
+
+    # The arrays which fully describe the table, together with its segments
+    ARRAYS = ('node_positions', 'node_segments', 'sources', 'targets', 'frequencies', 'offsets',
+              'transition_positions', 'position_offsets')
+
+    def __init__(self, segments, positions, key_ids, next_key_ids, frequencies):
+        self.segments = list(segments)
+        self.segment_ids = dict((segment, i) for i, segment in enumerate(self.segments))
+        nsegments = max(len(self.segments), 1)
+        positions = np.asarray(positions, dtype=np.int64)
+        key_codes = positions * nsegments + np.asarray(key_ids, dtype=np.int64)
+        next_key_codes = (positions + 1) * nsegments + np.asarray(next_key_ids, dtype=np.int64)
+
+        # Nodes are ordered by position, then by first appearance, so start keys keep their order
+        codes, first_seen, inverse = np.unique(
+            np.concatenate((key_codes, next_key_codes)), return_index=True, return_inverse=True)
+        order = np.lexsort((first_seen, codes // nsegments))
+        node_ids = np.empty(len(codes), dtype=np.int64)
+        node_ids[order] = np.arange(len(codes))
+        self.node_positions = (codes[order] // nsegments).astype(np.int32)
+        self.node_segments = (codes[order] % nsegments).astype(np.int32)
+        self.node_values = [self.segments[segment_id] for segment_id in self.node_segments.tolist()]
+        self.node_ids = dict(((position, segment_id), node) for node, (position, segment_id) in
+                             enumerate(zip(self.node_positions.tolist(), self.node_segments.tolist())))
+
+        inverse = node_ids[inverse.reshape(-1)]
+        sources, targets = inverse[:len(key_codes)], inverse[len(key_codes):]
+        transition_order = np.argsort(sources, kind='stable')
+        self.sources = sources[transition_order].astype(np.int32)
+        self.targets = targets[transition_order].astype(np.int32)
+        self.frequencies = np.asarray(frequencies)[transition_order]
+        self.offsets = np.searchsorted(self.sources, np.arange(len(codes) + 1)).astype(np.int64)
+        self.transition_positions = self.node_positions[self.sources]
+        self.npositions = int(self.node_positions.max()) + 1 if len(codes) else 0
+        self.position_offsets = np.searchsorted(
+            self.transition_positions, np.arange(self.npositions + 1)).astype(np.int64)
+        self.attribute_codes = {}
+
+    @classmethod
+    def from_arrays(cls, segments, arrays):
+        """
+        Rebuilds a table from its segments and the arrays named in ARRAYS, without copying the arrays,
+        so they can be memory mapped from disk.
+        """
+        table = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            setattr(table, name, arrays[name])
+        table.segments = list(segments)
+        table.segment_ids = dict((segment, i) for i, segment in enumerate(table.segments))
+        table.node_values = [table.segments[segment_id] for segment_id in table.node_segments.tolist()]
+        table.node_ids = dict(((position, segment_id), node) for node, (position, segment_id) in
+                              enumerate(zip(table.node_positions.tolist(), table.node_segments.tolist())))
+        table.npositions = len(table.position_offsets) - 1
+        table.attribute_codes = {}
+        return table
+
+    def __len__(self):
+        return len(self.targets)
+
+    def get_node(self, position, segment):
+        """
+        Returns the node id for a segment at a position, or None if the table does not contain it.
+        """
+        segment_id = self.segment_ids.get(segment)
+        if segment_id is None:
+            return None
+        return self.node_ids.get((position, segment_id))
+
+    def get_transition(self, node, next_node):
+        """
+        Returns the index of the transition between two nodes, or None if there is no such transition.
+        """
+        start, end = self.offsets[node], self.offsets[node + 1]
+        found = np.flatnonzero(self.targets[start:end] == next_node)
+        return int(start + found[0]) if len(found) else None
+
+    def get_attribute_codes(self, attribute):
+        """
+        Returns an array with an integer code per segment for the values of an attribute,
+        together with the mapping from attribute values to codes.
+        """
+        if attribute not in self.attribute_codes:
+            lookup = {}
+            codes = np.array([lookup.setdefault(getattr(segment, attribute), len(lookup))
+                              for segment in self.segments], dtype=np.int32)
+            self.attribute_codes[attribute] = (codes, lookup)
+        return self.attribute_codes[attribute]
+
+    def nbytes(self):
+        """
+        Returns the number of bytes held by the NumPy arrays of the table.
+        """
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+
+class CompactBigramChain():
+    """
+    A memory efficient alternative to BigramChain, backed by a shared TransitionTable.
+    A chain is a view on the table: filtering returns a new chain over the same table with
+    a boolean mask of active transitions, so no transitions are ever copied.
+    It supports the same operations as BigramChain and generates candidates in the same order.
+    """
+
+    def __init__(self, language_plugin, table=None, mask=None):
+        self.language_plugin = language_plugin
+        try:
+            self.hidden_sequence = self.language_plugin.hidden_sequence
+        except AttributeError:
+            self.hidden_sequence = False
+        self.table = table
+        self.mask = mask
+        self.startkeys = []
+        self.limit_frequencies = {}
+        self.__keys = None
+        self.__successors = {}
+        self.__deviations = None
+
+    @classmethod
+    def from_bigramchain(cls, bigramchain):
+        """
+        Build a compact chain holding the same transitions as a BigramChain.
+        """
+        chain = cls(bigramchain.language_plugin, TransitionTable(*bigramchain.flatten()))
+        chain.set_startkeys()
+        return chain
+
+    def load_compiled(self, path, tag):
+        """
+        Build the transition table from a file written by BigramChain.dump_compiled.
+        Returns False if the file can not be used for the given tag.
+        """
+        compiled = read_compiled(path, tag, self.language_plugin)
+        if compiled is None:
+            return False
+        self.table = TransitionTable(*compiled)
+        self.mask = None
+        self.__keys = None
+        self.__successors = {}
+        self.__deviations = None
+        self.set_startkeys()
+        return True
+
+    def __view(self, mask):
+        return CompactBigramChain(self.language_plugin, self.table, mask)
+
+    def __active(self):
+        """
+        Returns a fresh boolean array of the transitions active in this view.
+        """
+        if self.mask is None:
+            return np.ones(len(self.table), dtype=bool)
+        return self.mask.copy()
+
+    def __get_keys(self):
+        """
+        Returns a boolean array marking the nodes with at least one active transition.
+        These are the nodes that would be keys of the equivalent BigramChain.
+        """
+        if self.__keys is None:
+            sources = self.table.sources if self.mask is None else self.table.sources[self.mask]
+            self.__keys = np.bincount(sources, minlength=len(self.table.node_values)) > 0
+        return self.__keys
+
+    def __get_deviations(self, reference_sequence):
+        """
+        Returns the signed difference between the frequency of each transition and the frequency of the
+        reference transition at the same position, for the positions spanned by the reference sequence.
+        This is computed once per reference sequence, so each band of a concentric search costs a single
+        comparison over the relevant positions.
+        """
+        reference_key = tuple(reference_sequence)
+        # Read the cached value once, since views may be shared between generator sessions
+        cached = self.__deviations
+        if cached is None or cached[0] != reference_key:
+            table = self.table
+            frequencies = self.get_frequencies(reference_sequence)
+            npositions = min(len(frequencies), table.npositions)
+            end = table.position_offsets[npositions]
+            reference_frequencies = np.array(
+                [frequencies[position] for position in range(npositions)] or [0])
+            deviations = table.frequencies[:end] - reference_frequencies[table.transition_positions[:end]]
+            cached = (reference_key, deviations)
+            self.__deviations = cached
+        return cached[1]
+
+    def __get_successors(self, node):
+        if node not in self.__successors:
+            start, end = self.table.offsets[node], self.table.offsets[node + 1]
+            targets = self.table.targets[start:end]
+            if self.mask is not None:
+                targets = targets[self.mask[start:end]]
+            self.__successors[node] = targets.tolist()
+        return self.__successors[node]
+
+    def __len__(self):
+        if self.table is None:
+            return 0
+        return int(np.count_nonzero(self.__get_keys()))
+
+    def set_startkeys(self, reference_sequence=None, fields=None):
+        if self.table is None:
+            self.startkeys = []
+            return
+        keys = self.__get_keys()
+        self.startkeys = [node for node in np.flatnonzero(keys).tolist()
+                          if self.table.node_positions[node] == 0]
+
+    def get_frequencies(self, reference_sequence):
+        frequencies = {}
+        for position in range(len(reference_sequence)-1):
+            frequency = 0
+            if self.table is not None:
+                node = self.table.get_node(position, reference_sequence[position])
+                next_node = self.table.get_node(position+1, reference_sequence[position+1])
+                if node is not None and next_node is not None:
+                    transition = self.table.get_transition(node, next_node)
+                    if transition is not None and (self.mask is None or self.mask[transition]):
+                        frequency = self.table.frequencies[transition].item()
+            frequencies[position] = frequency
+        return frequencies
+
+    def frequency_filter(self, reference_sequence, lower, upper, kind='dev'):
+        table = self.table
+        mask = self.__active()
+        if kind == 'dev':
+            deviations = self.__get_deviations(reference_sequence)
+            end = len(deviations)
+            mask[:end] &= (deviations >= -lower) & (deviations <= upper)
+            mask[end:] = False
+        elif kind == 'limit':
+            mask &= (table.frequencies >= lower) & (table.frequencies <= upper)
+        result = self.__view(mask).clean(len(reference_sequence)-1)
+        result.set_startkeys()
+        return result
+
+    def segmentset_filter(self, reference_sequence, segmentset):
+        segmentset = segmentset.union(set(('^', '$')))
+        table = self.table
+        in_segmentset = np.array([segment.letters in segmentset for segment in table.segments],
+                                 dtype=bool)
+        mask = self.__active()
+        mask &= in_segmentset[table.node_segments[table.sources]]
+        mask &= in_segmentset[table.node_segments[table.targets]]
+        result = self.__view(mask).clean(len(reference_sequence)-1)
+        result.set_startkeys()
+        return result
+
+    def attribute_filter(self, reference_sequence, attribute):
+        table = self.table
+        codes, lookup = table.get_attribute_codes(attribute)
+        if type(reference_sequence[0]) == self.language_plugin.Segment:
+            values = [segment.__getattribute__(attribute) for segment in reference_sequence]
+        else:
+            values = list(reference_sequence)
+        npositions = min(len(values), table.npositions)
+        end = table.position_offsets[npositions]
+        reference_codes = np.array([lookup.get(value, -1) for value in values[:npositions]] or [-1])
+        sources = table.sources[:end]
+        mask = self.__active()
+        mask[:end] &= codes[table.node_segments[sources]] == reference_codes[table.transition_positions[:end]]
+        mask[end:] = False
+        return self.__view(mask)
+
+    def clean(self, maxpos):
+        """
+        Remove chains that can not be completed.
+        A single backward pass from maxpos keeps the transitions that lead to position maxpos,
+        then a single forward pass drops the transitions that can not be reached from position 0.
+        """
+        table = self.table
+        mask = self.__active()
+        npositions = min(maxpos, table.npositions)
+        mask[table.position_offsets[npositions]:] = False
+        completable = np.zeros(len(table.node_values), dtype=bool)
+        for position in range(npositions - 1, -1, -1):
+            start, end = table.position_offsets[position], table.position_offsets[position + 1]
+            if position + 1 != maxpos:
+                mask[start:end] &= completable[table.targets[start:end]]
+            completable[table.sources[start:end][mask[start:end]]] = True
+        reachable = table.node_positions == 0
+        for position in range(npositions):
+            start, end = table.position_offsets[position], table.position_offsets[position + 1]
+            mask[start:end] &= reachable[table.sources[start:end]]
+            reachable[table.targets[start:end][mask[start:end]]] = True
+        return self.__view(mask)
+
+    def nbytes(self):
+        """
+        Returns the number of bytes held by the mask of the view, since the table is shared with the chain it was filtered from.
+        """
+        return self.mask.nbytes if self.mask is not None else 0
+
+    def get_max_frequency(self):
+        if self.table is None:
+            return 0
+        frequencies = self.table.frequencies if self.mask is None else self.table.frequencies[self.mask]
+        return frequencies.max().item() if len(frequencies) else 0
+
+    def get_position_frequencies(self):
+        """
+        Returns the sorted distinct frequencies of the active transitions from every position of the chain.
+        """
+        if self.table is None:
+            return {}
+        table = self.table
+        active = self.__active()
+        position_frequencies = {}
+        for position in range(table.npositions):
+            start, end = table.position_offsets[position], table.position_offsets[position + 1]
+            frequencies = table.frequencies[start:end][active[start:end]]
+            if len(frequencies) > 0:
+                position_frequencies[position] = np.unique(frequencies).tolist()
+        return position_frequencies
+
+    def generate(self, startkeys=None, exclude=None, constraints=None, rng=None):
+        """
+        Yields all paths through the chain, starting from the given start keys.
+        If exclude is given (a view on the same table, typically the chain of the previous, narrower band
+        of a concentric search), paths of which every transition is also active in exclude are skipped.
+        If constraints (a PathConstraints) are given, only the paths which satisfy them are produced.
+        Paths are shuffled with rng (a random.Random, or the random module if None).
+        """
+        rng = rng if rng is not None else random
+        if startkeys is None:
+            startkeys = self.startkeys
+        new_transitions = fresh_nodes = None
+        if exclude is not None:
+            new_transitions, fresh_nodes = self.__get_fresh_nodes(exclude)
+            startkeys = [node for node in startkeys if fresh_nodes[node]]
+        startkeys = list(startkeys)
+        rng.shuffle(startkeys)
+        if len(self) > 0:
+            yield from self.__walk(startkeys, new_transitions, fresh_nodes, constraints, rng)
+        else:
+            raise Exception('LinkError')
+
+    def __walk(self, startkeys, new_transitions, fresh_nodes, constraints, rng):
+        """
+        Walks the paths from the start nodes depth first with an explicit stack, in the same order as BigramChain.
+        Every stack frame holds the path so far, its constraint state and an iterator over the (node, fresh) pairs
+        still to visit after it.
+        A fresh node, only visited when new_transitions is given, may only continue along transitions which lead to
+        a path using at least one of the new transitions. Once one is taken, the rest of the path is unrestricted.
+        Nodes which make the path violate the constraints are skipped before their successors are shuffled.
+        """
+        table = self.table
+        keys = self.__get_keys()
+        advance = complete = None
+        if constraints is not None:
+            advance, complete = constraints.prepare(self.__get_letter_ranges())
+            node_positions = table.node_positions.tolist()
+        stack = [((), (0, 0), iter([(node, new_transitions is not None) for node in startkeys]))]
+        while stack:
+            path, state, nodes = stack[-1]
+            node, fresh = next(nodes, (None, False))
+            if node is None:
+                stack.pop()
+                continue
+            if advance is not None:
+                next_state = advance(state, node_positions[node], table.node_values[node])
+                if next_state is None:
+                    continue
+            else:
+                next_state = state
+            if fresh:
+                start, end = table.offsets[node], table.offsets[node + 1]
+                if self.mask is None:
+                    transitions = list(range(start, end))
+                else:
+                    transitions = (np.flatnonzero(self.mask[start:end]) + start).tolist()
+                rng.shuffle(transitions)
+                next_nodes = []
+                for transition in transitions:
+                    next_node = int(table.targets[transition])
+                    if new_transitions[transition]:
+                        next_nodes.append((next_node, False))
+                    elif fresh_nodes[next_node]:
+                        next_nodes.append((next_node, True))
+                stack.append((path + (table.node_values[node],), next_state, iter(next_nodes)))
+            elif not keys[node]:
+                if complete is None or complete(next_state):
+                    yield path + (table.node_values[node],)
+            else:
+                next_nodes = list(self.__get_successors(node))
+                rng.shuffle(next_nodes)
+                stack.append((path + (table.node_values[node],), next_state,
+                              iter([(next_node, False) for next_node in next_nodes])))
+
+    def __get_letter_ranges(self):
+        """
+        Returns the fewest and the most letters of the segments at every position of the chain.
+        """
+        table = self.table
+        active = self.__active()
+        nodes = np.unique(np.concatenate((table.sources[active], table.targets[active])))
+        letters = np.array([len(segment.letters) for segment in table.segments] or [0])[table.node_segments[nodes]]
+        positions = table.node_positions[nodes]
+        letter_ranges = {}
+        for position in np.unique(positions).tolist():
+            at_position = letters[positions == position]
+            letter_ranges[position] = (int(at_position.min()), int(at_position.max()))
+        return letter_ranges
+
+    def __get_fresh_nodes(self, exclude):
+        """
+        Returns a mask of the transitions that are active in this view but not in exclude, and a mask
+        of the nodes from which a path can be completed using at least one of those transitions.
+        """
+        table = self.table
+        active = self.__active()
+        new_transitions = active & ~exclude.__active()
+        fresh_nodes = np.zeros(len(table.node_values), dtype=bool)
+        for position in range(table.npositions - 1, -1, -1):
+            start, end = table.position_offsets[position], table.position_offsets[position + 1]
+            leads = active[start:end] & (new_transitions[start:end] | fresh_nodes[table.targets[start:end]])
+            fresh_nodes[table.sources[start:end][leads]] = True
+        return new_transitions, fresh_nodes
+
+    def sample(self, rng=None, startkeys=None):
+        """
+        Yields paths drawn at random from the start nodes, without end, each with a probability proportional
+        to the product of its transition frequencies, like BigramChain.sample.
+        The completion weights of all nodes are computed with one pass over the positions, from the last backwards;
+        the cumulative weights of the successors of a node are only computed when a draw first reaches it.
+        Draws are made with rng (a random.Random, or the random module if None), like generate.
+        """
+        rng = rng if rng is not None else random
+        if startkeys is None:
+            startkeys = self.startkeys
+        table = self.table
+        active = self.__active()
+        keys = self.__get_keys()
+        # Nodes without active transitions end a path, and count as a single completion
+        completion_weights = np.ones(len(table.node_values))
+        for position in range(table.npositions - 1, -1, -1):
+            start, end = table.position_offsets[position], table.position_offsets[position + 1]
+            sources = table.sources[start:end][active[start:end]]
+            weights = (table.frequencies[start:end][active[start:end]]
+                       * completion_weights[table.targets[start:end][active[start:end]]])
+            completion_weights[sources] = np.bincount(sources, weights, len(completion_weights))[sources]
+        cumulative_weights = {}
+        startkeys = list(startkeys)
+        start_weights = list(accumulate(completion_weights[startkeys].tolist()))
+        if not start_weights or start_weights[-1] <= 0:
+            return
+        while True:
+            node = startkeys[_draw(rng, start_weights)]
+            path = [table.node_values[node]]
+            while keys[node]:
+                if node not in cumulative_weights:
+                    successors = self.__get_successors(node)
+                    start, end = table.offsets[node], table.offsets[node + 1]
+                    frequencies = table.frequencies[start:end]
+                    if self.mask is not None:
+                        frequencies = frequencies[self.mask[start:end]]
+                    cumulative_weights[node] = (
+                        successors, np.cumsum(frequencies * completion_weights[successors]).tolist())
+                successors, weights = cumulative_weights[node]
+                node = successors[_draw(rng, weights)]
+                path.append(table.node_values[node])
+            yield tuple(path)
+
+    def display(self):
+        keys = self.__get_keys()
+        for node in np.flatnonzero(keys).tolist():
+            print('***', self.table.node_positions[node], self.table.node_values[node])
+            start = self.table.offsets[node]
+            for i, next_node in enumerate(self.table.targets[start:self.table.offsets[node + 1]].tolist()):
+                if self.mask is None or self.mask[start + i]:
+                    print(self.table.node_values[next_node], self.table.frequencies[start + i])
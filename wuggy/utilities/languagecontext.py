@@ -0,0 +1,197 @@
+import os
+import pickle
+import sys
+from types import FunctionType, MappingProxyType, MethodType, ModuleType
+
+from .bigramchain import deserialize_segments, serialize_segments
+from .lrucache import LRUCache
+from .mappedstrings import MappedLookup, MappedStrings, write_strings
+from .neighborindex import NeighborIndex
+
+# Bump whenever the layout written by write_language_data changes.
+LANGUAGE_DATA_FORMAT_VERSION = 2
+
+# The default number of bytes of filtered subchains kept per language, see LanguageContext.
+DEFAULT_SUBCHAIN_CACHE_SIZE = 64 * 1024 * 1024
+
+# The number of reference frequency tables kept per language, one for every cached attribute filtered subchain they belong to.
+POSITION_FREQUENCIES_CACHE_SIZE = 256
+
+
+def deep_sizeof(root) -> int:
+    """
+    Returns an estimate in bytes of the memory held by an object and everything it references.
+    Objects reachable along several paths, such as interned segments, are counted once.
+    Classes, modules and functions are not counted, since they are shared by the whole process.
+    """
+    seen = set()
+    stack = [root]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (type, ModuleType, FunctionType, MethodType)):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, (dict, MappingProxyType)):
+            for key, value in obj.items():
+                stack.append(key)
+                stack.append(value)
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif type(obj).__module__ == "numpy" and getattr(obj, "base", None) is not None:
+            # A NumPy view only reports the size of its header, the data belongs to its base
+            stack.append(obj.base)
+        if hasattr(obj, "__dict__"):
+            stack.append(obj.__dict__)
+    return total
+
+
+class LanguageContext():
+    """
+    Everything a WuggyGenerator needs to generate pseudowords in one language: the language plugin, its bigramchain and lexicons,
+    and the statistics and attribute filters it supports.
+    Activating a language only copies these references onto the generator.
+    The subchain cache keeps filtered subchains of the bigramchain up to about subchain_cache_size bytes, as estimated by
+    their nbytes method, and is shared by every generation request in this language.
+    The distinct transition frequencies of the cached subchains are kept in a separate, smaller cache, so the many
+    frequency filtered subchains do not evict them.
+    """
+
+    def __init__(self, language_plugin, language_plugin_data_path: str, bigramchain, word_lexicon: dict,
+                 neighbor_index, lookup_lexicon: MappingProxyType, supported_statistics: [str],
+                 supported_attribute_filters: dict, default_attributes: [str],
+                 subchain_cache_size: int = DEFAULT_SUBCHAIN_CACHE_SIZE):
+        self.language_plugin = language_plugin
+        self.language_plugin_data_path = language_plugin_data_path
+        self.bigramchain = bigramchain
+        self.word_lexicon = word_lexicon
+        # The neighbor lexicon is the sorted tuple held by the index, rather than a second copy
+        self.neighbor_lexicon = neighbor_index.words
+        self.neighbor_index = neighbor_index
+        self.lookup_lexicon = lookup_lexicon
+        self.supported_statistics = supported_statistics
+        self.supported_attribute_filters = supported_attribute_filters
+        self.default_attributes = default_attributes
+        # Tag identifying the version of the plugin data, only computed when it is needed
+        self.data_tag = None
+        self.subchain_cache = LRUCache(subchain_cache_size, lambda subchain: subchain.nbytes()) \
+            if subchain_cache_size else None
+        self.position_frequencies_cache = LRUCache(POSITION_FREQUENCIES_CACHE_SIZE) if subchain_cache_size else None
+
+    def nbytes(self) -> int:
+        """
+        Returns an estimate of the memory used by this language, in bytes.
+        The subchain cache is counted at its full size, so it can fill up without exceeding a memory budget.
+        """
+        size = deep_sizeof(dict((name, value) for name, value in vars(self).items() if name != "subchain_cache"))
+        if self.subchain_cache is not None:
+            size += self.subchain_cache.max_size
+        return size
+
+
+def write_language_data(directory: str, context: LanguageContext, tag) -> None:
+    """
+    Writes the bigramchain and lexicons of a language context to a directory, in a read-only format which
+    read_language_data maps into memory: NumPy arrays for the transition table and the deletion neighborhood index,
+    and UTF-8 buffers with offsets for the lexicons, plus hash tables to look up words and references in constant time.
+    The tag is stored alongside and should identify the plugin data.
+    A BigramChain is converted to a CompactBigramChain first.
+    """
+    import json
+
+    import numpy as np
+
+    from .compactbigramchain import CompactBigramChain, TransitionTable
+    bigramchain = context.bigramchain
+    if not isinstance(bigramchain, CompactBigramChain):
+        bigramchain = CompactBigramChain.from_bigramchain(bigramchain)
+    serialized = serialize_segments(bigramchain.table.segments, context.language_plugin)
+    if serialized is None:
+        raise ValueError("The segment types of the bigramchain can not be found on the language plugin.")
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "segments.pickle"), "wb") as segments_file:
+        pickle.dump(serialized, segments_file, protocol=pickle.HIGHEST_PROTOCOL)
+    for name in TransitionTable.ARRAYS:
+        np.save(os.path.join(directory, name + ".npy"), getattr(bigramchain.table, name))
+
+    neighbor_index = context.neighbor_index
+    if neighbor_index.variant_hashes is None:
+        neighbor_index.build_deletion_index()
+    np.save(os.path.join(directory, "variant_hashes.npy"), neighbor_index.variant_hashes)
+    np.save(os.path.join(directory, "variant_words.npy"), neighbor_index.variant_words)
+    write_strings(neighbor_index.words, os.path.join(directory, "neighbor_lexicon"))
+
+    word_lexicon_keys = []
+    words = []
+    for first_letter, length in sorted(context.word_lexicon):
+        bucket = sorted(context.word_lexicon[first_letter, length])
+        word_lexicon_keys.append((first_letter, length, len(words), len(words) + len(bucket)))
+        words.extend(bucket)
+    write_strings(words, os.path.join(directory, "word_lexicon"), hashed=True)
+
+    references = sorted(context.lookup_lexicon)
+    write_strings(references, os.path.join(directory, "lookup_references"), hashed=True)
+    write_strings([context.lookup_lexicon[reference] for reference in references],
+                  os.path.join(directory, "lookup_segments"))
+
+    with open(os.path.join(directory, "manifest.json"), "w", encoding="utf-8") as manifest_file:
+        json.dump({"format": LANGUAGE_DATA_FORMAT_VERSION, "tag": tag, "byteorder": sys.byteorder,
+                   "neighbor_length_offsets": sorted((length, start, end) for length, (start, end)
+                                                     in neighbor_index.length_offsets.items()),
+                   "word_lexicon_keys": word_lexicon_keys},
+                  manifest_file, default=str)
+
+
+def read_language_data(directory: str, language_plugin, tag):
+    """
+    Maps a directory written by write_language_data into memory.
+    Returns its CompactBigramChain, word lexicon, NeighborIndex and lookup lexicon, or None if the directory
+    is missing or incomplete, was written for a different tag or format version, or on a machine with a different byte order.
+    None of the arrays and strings are copied into the process, so processes reading the same directory share them.
+    """
+    import json
+
+    import numpy as np
+
+    from .compactbigramchain import CompactBigramChain, TransitionTable
+    try:
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+        with open(os.path.join(directory, "segments.pickle"), "rb") as segments_file:
+            segment_type_names, serialized_segments = pickle.load(segments_file)
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+        return None
+    if manifest.get("format") != LANGUAGE_DATA_FORMAT_VERSION or manifest.get("byteorder") != sys.byteorder \
+            or manifest.get("tag") != json.loads(json.dumps(tag, default=str)):
+        return None
+    segments = deserialize_segments(segment_type_names, serialized_segments, language_plugin)
+    if segments is None:
+        return None
+
+    def load_array(name):
+        return np.load(os.path.join(directory, name + ".npy"), mmap_mode="r")
+
+    def open_strings(name, **kwargs):
+        return MappedStrings.open(os.path.join(directory, name), **kwargs)
+
+    try:
+        arrays = dict((name, load_array(name)) for name in TransitionTable.ARRAYS + ("variant_hashes", "variant_words"))
+        neighbor_lexicon = open_strings("neighbor_lexicon")
+        words = open_strings("word_lexicon", is_sorted=True, hashed=True)
+        lookup_references = open_strings("lookup_references", is_sorted=True, hashed=True)
+        lookup_segments = open_strings("lookup_segments")
+    except (OSError, ValueError, TypeError):
+        return None
+    table = TransitionTable.from_arrays(segments, dict((name, arrays[name]) for name in TransitionTable.ARRAYS))
+    bigramchain = CompactBigramChain(language_plugin, table)
+    bigramchain.set_startkeys()
+
+    neighbor_index = NeighborIndex.from_sorted(
+        neighbor_lexicon,
+        dict((length, (start, end)) for length, start, end in manifest["neighbor_length_offsets"]),
+        arrays["variant_hashes"], arrays["variant_words"])
+    word_lexicon = dict(((first_letter, length), words[start:end])
+                        for first_letter, length, start, end in manifest["word_lexicon_keys"])
+    lookup_lexicon = MappedLookup(lookup_references, lookup_segments)
+    return bigramchain, word_lexicon, neighbor_index, lookup_lexicon
@@ -0,0 +1,78 @@
+from collections import OrderedDict
+from threading import Lock
+
+
+class LRUCache():
+    """
+    A mapping which keeps its most recently used entries within a size budget.
+    Every entry is sized by sizeof (1 per entry by default). When an insertion takes the total size over max_size,
+    the least recently used entries are evicted until it fits again. The entry inserted last is never evicted,
+    even if it exceeds max_size by itself. A max_size of None keeps every entry.
+    The cache can be shared between threads.
+    """
+
+    def __init__(self, max_size: float = None, sizeof=None):
+        self.max_size = max_size
+        self.sizeof = sizeof if sizeof is not None else (lambda value: 1)
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.size = 0
+        self.lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self.entries
+
+    def __iter__(self):
+        """
+        Iterates over the keys, from least to most recently used.
+        """
+        with self.lock:
+            return iter(list(self.entries))
+
+    def items(self) -> list:
+        """
+        Returns the entries as (key, value) pairs, from least to most recently used, without marking them as used.
+        """
+        with self.lock:
+            return list(self.entries.items())
+
+    def __getitem__(self, key):
+        with self.lock:
+            value = self.entries[key]
+            self.entries.move_to_end(key)
+            return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, value) -> None:
+        size = self.sizeof(value)
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.sizes[key]
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            self.sizes[key] = size
+            self.size += size
+            while self.max_size is not None and self.size > self.max_size and len(self.entries) > 1:
+                evicted_key, _ = self.entries.popitem(last=False)
+                self.size -= self.sizes.pop(evicted_key)
+
+    def pop(self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                return default
+            self.size -= self.sizes.pop(key)
+            return self.entries.pop(key)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.sizes.clear()
+            self.size = 0
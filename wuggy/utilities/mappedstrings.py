@@ -0,0 +1,148 @@
+import mmap
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+from zlib import crc32
+
+
+def write_strings(strings: [str], path: str, hashed: bool = False) -> None:
+    """
+    Writes strings as one UTF-8 buffer (path.strings) and the native int64 offsets of every string
+    in that buffer (path.offsets), which MappedStrings.open can map into memory.
+    If hashed is set, it also writes an open addressing hash table of the strings (path.hashes),
+    with which MappedStrings finds a string in constant time.
+    """
+    offsets = array('q', [0])
+    string_hashes = []
+    with open(path + ".strings", "wb") as strings_file:
+        for string in strings:
+            encoded = string.encode("utf-8")
+            strings_file.write(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+            string_hashes.append(crc32(encoded))
+    with open(path + ".offsets", "wb") as offsets_file:
+        offsets.tofile(offsets_file)
+    if not hashed:
+        return
+    # A power of two of at least twice the number of strings keeps the probe sequences short
+    mask = (1 << max(1, (2 * len(string_hashes)).bit_length())) - 1
+    table = array('q', bytes(8 * (mask + 1)))
+    for index, string_hash in enumerate(string_hashes):
+        position = string_hash & mask
+        while table[position]:
+            position = (position + 1) & mask
+        # Entries hold the index of the string plus one, so that 0 marks an empty slot
+        table[position] = index + 1
+    with open(path + ".hashes", "wb") as hashes_file:
+        table.tofile(hashes_file)
+
+
+def _map_file(path: str):
+    with open(path, "rb") as mapped_file:
+        if mapped_file.seek(0, 2) == 0:
+            return b""
+        return mmap.mmap(mapped_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class MappedStrings(Sequence):
+    """
+    A read-only sequence of strings backed by a UTF-8 buffer and an offset per string, as written by write_strings.
+    The files are memory mapped, so processes opening the same files share their pages, and strings are only decoded
+    when they are accessed. Slices are views on the same buffers.
+    Strings are found in constant time through the hash table written by write_strings(hashed=True), if there is one.
+    Otherwise, for strings written in sorted order, set is_sorted to find strings by binary search.
+    """
+
+    def __init__(self, data, offsets, start: int = 0, stop: int = None, is_sorted: bool = False, hashes=None):
+        self.data = data
+        self.offsets = offsets
+        self.start = start
+        self.stop = len(offsets) - 1 if stop is None else stop
+        self.is_sorted = is_sorted
+        self.hashes = hashes
+
+    @classmethod
+    def open(cls, path: str, is_sorted: bool = False, hashed: bool = False) -> "MappedStrings":
+        offsets = _map_file(path + ".offsets")
+        offsets = memoryview(offsets).cast('q') if len(offsets) else memoryview(array('q', [0]))
+        hashes = memoryview(_map_file(path + ".hashes")).cast('q') if hashed else None
+        data = _map_file(path + ".strings")
+        if len(data) != offsets[-1]:
+            raise ValueError(f"{path} does not match its offsets")
+        # write_strings sizes the hash table to a power of two of more than twice the number of strings
+        if hashes is not None and (len(hashes) & (len(hashes) - 1) or len(hashes) <= 2 * (len(offsets) - 1)):
+            raise ValueError(f"{path} does not match its hash table")
+        return cls(data, offsets, is_sorted=is_sorted, hashes=hashes)
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return MappedStrings(self.data, self.offsets, self.start + start, self.start + max(start, stop),
+                                 self.is_sorted, self.hashes)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("MappedStrings index out of range")
+        index += self.start
+        return self.data[self.offsets[index]:self.offsets[index + 1]].decode("utf-8")
+
+    def __iter__(self):
+        data, offsets = self.data, self.offsets
+        for index in range(self.start, self.stop):
+            yield data[offsets[index]:offsets[index + 1]].decode("utf-8")
+
+    def find(self, string: str) -> int:
+        """
+        Returns the index of a string in a hashed or sorted sequence, or -1 if it is not in the sequence.
+        """
+        if self.hashes is not None:
+            return self.__find_hashed(string)
+        index = bisect_left(self, string)
+        return index if index < len(self) and self[index] == string else -1
+
+    def __find_hashed(self, string: str) -> int:
+        encoded = string.encode("utf-8")
+        data, offsets, hashes = self.data, self.offsets, self.hashes
+        mask = len(hashes) - 1
+        position = crc32(encoded) & mask
+        while hashes[position]:
+            index = hashes[position] - 1
+            # The table covers the whole buffer, while a slice only contains its own strings
+            if self.start <= index < self.stop and data[offsets[index]:offsets[index + 1]] == encoded:
+                return index - self.start
+            position = (position + 1) & mask
+        return -1
+
+    def __contains__(self, string) -> bool:
+        if not isinstance(string, str):
+            return False
+        if self.hashes is not None or self.is_sorted:
+            return self.find(string) != -1
+        return any(string == candidate for candidate in self)
+
+
+class MappedLookup(Mapping):
+    """
+    A read-only mapping between two MappedStrings of equal length: the sorted keys and their values.
+    """
+
+    def __init__(self, keys: MappedStrings, values: MappedStrings):
+        self.mapped_keys = keys
+        self.mapped_values = values
+
+    def __getitem__(self, key):
+        index = self.mapped_keys.find(key) if isinstance(key, str) else -1
+        if index == -1:
+            raise KeyError(key)
+        return self.mapped_values[index]
+
+    def __len__(self) -> int:
+        return len(self.mapped_keys)
+
+    def __iter__(self):
+        return iter(self.mapped_keys)
@@ -0,0 +1,188 @@
+import heapq
+from bisect import bisect_left, bisect_right
+from zlib import crc32
+
+
+class NeighborIndex():
+    """
+    An index over a neighbor lexicon, used to compute orthographic neighborhood statistics such as OLD20 and NED1
+    without comparing a word to every entry of the lexicon.
+    Words are bucketed by length: since the Levenshtein distance between two words is at least the difference
+    in their lengths, buckets can be visited in order of increasing length difference and skipped once they
+    can no longer contain a closer neighbor.
+    Neighbors at distance 1 are found through a deletion neighborhood index, which maps every word and every
+    variant of it with a single letter deleted to the word. This index is only built on first use.
+    Like the lexicon it is built from, the index keeps duplicate entries, so results match a scan of the list,
+    although words are returned ordered by length.
+    """
+
+    def __init__(self, lexicon: [str]):
+        # One tuple sorted by length, in which each length occupies the slice given by length_offsets
+        self.words = tuple(sorted(sorted(lexicon), key=len))
+        lengths = [len(word) for word in self.words]
+        self.length_offsets = dict((length, (bisect_left(lengths, length), bisect_right(lengths, length)))
+                                   for length in set(lengths))
+        self.max_length = max(self.length_offsets, default=0)
+        self.variant_hashes = None
+        self.variant_words = None
+
+    @classmethod
+    def from_sorted(cls, words, length_offsets: dict, variant_hashes=None, variant_words=None) -> "NeighborIndex":
+        """
+        Rebuilds an index from words already sorted by length, then alphabetically, the slice of the words
+        of every length, and optionally the arrays of the deletion neighborhood index.
+        None of them are copied, so they can be memory mapped from disk.
+        """
+        index = cls(())
+        index.words = words
+        index.length_offsets = length_offsets
+        index.max_length = max(length_offsets, default=0)
+        index.variant_words = variant_words
+        index.variant_hashes = variant_hashes
+        return index
+
+    def __len__(self):
+        return len(self.words)
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __buckets_by_length_difference(self, length: int):
+        """
+        Yields the length difference and the words of each bucket, closest lengths first.
+        """
+        for length_difference in range(max(length, self.max_length - length) + 1):
+            for bucket_length in sorted(set((length - length_difference, length + length_difference))):
+                if bucket_length in self.length_offsets:
+                    start, end = self.length_offsets[bucket_length]
+                    yield length_difference, self.words[start:end]
+
+    def old(self, source: str, n: int) -> float:
+        """
+        Returns the mean Levenshtein distance from source to its n closest words in the lexicon (OLD-n).
+        Distances are computed with a cutoff at the current n-th best distance, since anything beyond it
+        can not change the result.
+        """
+        if n < 1:
+            raise ValueError("OLD-n is only defined for n >= 1.")
+        # Max-heap (through negated distances) of the n smallest distances found so far
+        closest = []
+        for length_difference, bucket in self.__buckets_by_length_difference(len(source)):
+            if self.__update_closest(source, closest, n, length_difference, bucket):
+                break
+        return -sum(closest) / float(n)
+
+    def old_batch(self, sources: [str], n: int) -> [float]:
+        """
+        Returns OLD-n for every source, as old does, in a single pass over the buckets for all sources of
+        the same length: every bucket is read once (decoding it if the lexicon is memory mapped) and each
+        source drops out of the pass as soon as the remaining buckets can no longer improve it.
+        """
+        if n < 1:
+            raise ValueError("OLD-n is only defined for n >= 1.")
+        closest = dict((source, []) for source in sources)
+        sources_by_length = {}
+        for source in closest:
+            sources_by_length.setdefault(len(source), []).append(source)
+        for length, remaining in sources_by_length.items():
+            for length_difference, bucket in self.__buckets_by_length_difference(length):
+                if not remaining:
+                    break
+                bucket = list(bucket)
+                remaining = [source for source in remaining
+                             if not self.__update_closest(source, closest[source], n, length_difference, bucket)]
+        return [-sum(closest[source]) / float(n) for source in sources]
+
+    @staticmethod
+    def __update_closest(source: str, closest: [int], n: int, length_difference: int, bucket) -> bool:
+        """
+        Pushes the distances from source to the words of a bucket onto the negated max-heap closest.
+        Returns True as soon as no word at this or a larger length difference can be closer than the n closest.
+        """
+        from Levenshtein import distance
+        for target in bucket:
+            if len(closest) < n:
+                heapq.heappush(closest, -distance(source, target))
+                continue
+            if length_difference >= -closest[0]:
+                return True
+            target_distance = distance(source, target, score_cutoff=-closest[0] - 1)
+            if target_distance < -closest[0]:
+                heapq.heapreplace(closest, -target_distance)
+        return False
+
+    @staticmethod
+    def __variants(word: str):
+        return set([word] + [word[:i] + word[i + 1:] for i in range(len(word))])
+
+    @staticmethod
+    def __hash(variant: str) -> int:
+        return crc32(variant.encode("utf-8"))
+
+    def build_deletion_index(self) -> None:
+        """
+        Builds the deletion neighborhood index as two parallel arrays, sorted by the hash of the variants.
+        Hash collisions only add candidates, which are verified anyway.
+        """
+        import numpy as np
+        hashes = []
+        words = []
+        for i, word in enumerate(self.words):
+            for variant in self.__variants(word):
+                hashes.append(self.__hash(variant))
+                words.append(i)
+        hashes = np.array(hashes, dtype=np.uint32)
+        order = np.argsort(hashes, kind='stable')
+        # variant_hashes is set last, since it signals that the index is ready to other threads
+        self.variant_words = np.array(words, dtype=np.int32)[order]
+        self.variant_hashes = hashes[order]
+
+    def neighbors_at_distance(self, source: str, distance: int) -> [str]:
+        """
+        Returns the words in the lexicon at exactly the given Levenshtein distance from source.
+        """
+        import numpy as np
+        from Levenshtein import distance as levenshtein_distance
+        if distance != 1:
+            return [target for length_difference, bucket in self.__buckets_by_length_difference(len(source))
+                    if length_difference <= distance
+                    for target in bucket if levenshtein_distance(source, target) == distance]
+        if self.variant_hashes is None:
+            self.build_deletion_index()
+        hashes = np.array([self.__hash(variant) for variant in self.__variants(source)], dtype=np.uint32)
+        starts = np.searchsorted(self.variant_hashes, hashes, side='left')
+        ends = np.searchsorted(self.variant_hashes, hashes, side='right')
+        candidates = set()
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            candidates.update(self.variant_words[start:end].tolist())
+        return [self.words[i] for i in sorted(candidates)
+                if levenshtein_distance(source, self.words[i]) == 1]
+
+    def neighbors_at_distance_batch(self, sources: [str], distance: int) -> [[str]]:
+        """
+        Returns the words at exactly the given Levenshtein distance from every source, as neighbors_at_distance does.
+        At distance 1 the variants of all sources are looked up in the deletion neighborhood index at once.
+        """
+        import numpy as np
+        from Levenshtein import distance as levenshtein_distance
+        if distance != 1:
+            return [self.neighbors_at_distance(source, distance) for source in sources]
+        if self.variant_hashes is None:
+            self.build_deletion_index()
+        unique_sources = list(dict.fromkeys(sources))
+        variants = [self.__variants(source) for source in unique_sources]
+        hashes = np.array([self.__hash(variant) for source_variants in variants for variant in source_variants],
+                          dtype=np.uint32)
+        starts = np.searchsorted(self.variant_hashes, hashes, side='left').tolist()
+        ends = np.searchsorted(self.variant_hashes, hashes, side='right').tolist()
+        neighbors = {}
+        position = 0
+        for source, source_variants in zip(unique_sources, variants):
+            candidates = set()
+            for start, end in zip(starts[position:position + len(source_variants)],
+                                  ends[position:position + len(source_variants)]):
+                candidates.update(self.variant_words[start:end].tolist())
+            position += len(source_variants)
+            neighbors[source] = [self.words[i] for i in sorted(candidates)
+                                 if levenshtein_distance(source, self.words[i]) == 1]
+        return [neighbors[source] for source in sources]
@@ -0,0 +1,85 @@
+import pickle
+from contextlib import contextmanager
+from time import time
+
+
+class ReferenceStatisticsCache():
+    """
+    A persistent cache of the statistics and transition frequencies of reference sequences, stored in an SQLite database,
+    so that they are computed once for every reference across runs, generator instances and processes.
+    Entries are keyed by the language plugin name, a tag identifying the version of its data, and the reference segments.
+    When the cache holds more than max_entries entries, the least recently used ones are removed.
+    Every operation opens its own connection, so one cache can be shared between threads and forked processes.
+    Assign it to the reference_statistics_cache property of a WuggyGenerator to use it.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000, timeout: float = 30):
+        self.path = path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        with self.__connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS reference_statistics ("
+                "language_plugin TEXT NOT NULL, data_tag TEXT NOT NULL, reference TEXT NOT NULL, "
+                "statistics BLOB NOT NULL, last_used REAL NOT NULL, "
+                "PRIMARY KEY (language_plugin, data_tag, reference))")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS reference_statistics_last_used ON reference_statistics (last_used)")
+
+    @contextmanager
+    def __connect(self):
+        """
+        Yields a connection in a transaction, which is committed (or rolled back on an error) and closed afterwards.
+        """
+        import sqlite3
+        connection = sqlite3.connect(self.path, timeout=self.timeout)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, language_plugin: str, data_tag: str, reference: str):
+        """
+        Returns the cached (statistics, transition frequencies) of a reference, or None if they are not cached.
+        """
+        key = (language_plugin, data_tag, reference)
+        with self.__connect() as connection:
+            row = connection.execute(
+                "SELECT statistics FROM reference_statistics "
+                "WHERE language_plugin = ? AND data_tag = ? AND reference = ?", key).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE reference_statistics SET last_used = ? "
+                "WHERE language_plugin = ? AND data_tag = ? AND reference = ?", (time(), *key))
+        try:
+            return pickle.loads(row[0])
+        except (EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+
+    def put(self, language_plugin: str, data_tag: str, reference: str, statistics: dict,
+            frequencies: list) -> None:
+        """
+        Stores the statistics and transition frequencies of a reference, then evicts the least recently used entries
+        if the cache holds more than max_entries entries.
+        """
+        value = pickle.dumps((statistics, frequencies), protocol=pickle.HIGHEST_PROTOCOL)
+        with self.__connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO reference_statistics VALUES (?, ?, ?, ?, ?)",
+                (language_plugin, data_tag, reference, value, time()))
+            excess = connection.execute("SELECT COUNT(*) FROM reference_statistics").fetchone()[0] - self.max_entries
+            if excess > 0:
+                connection.execute(
+                    "DELETE FROM reference_statistics WHERE rowid IN "
+                    "(SELECT rowid FROM reference_statistics ORDER BY last_used LIMIT ?)", (excess,))
+
+    def __len__(self) -> int:
+        with self.__connect() as connection:
+            return connection.execute("SELECT COUNT(*) FROM reference_statistics").fetchone()[0]
+
+    def clear(self) -> None:
+        with self.__connect() as connection:
+            connection.execute("DELETE FROM reference_statistics")
+
@@ -0,0 +1,66 @@
+from math import ceil, log
+
+
+class SequenceCache():
+    """
+    Remembers the sequences a generator has produced, in insertion order, with constant time membership tests.
+    For unbounded streaming runs, set bloom_capacity to keep memory constant: sequences are then only recorded in a
+    Bloom filter sized for that many sequences, which can not be iterated and may report a sequence as seen
+    (with probability error_rate) even though it was never added.
+    """
+
+    def __init__(self, bloom_capacity: int = None, error_rate: float = 0.001):
+        self.bloom_capacity = bloom_capacity
+        self.error_rate = error_rate
+        self.clear()
+
+    def clear(self) -> None:
+        self.length = 0
+        if self.bloom_capacity is None:
+            self.sequences = {}
+        else:
+            self.nbits = max(8, ceil(-self.bloom_capacity * log(self.error_rate) / log(2) ** 2))
+            self.nhashes = max(1, round(self.nbits / self.bloom_capacity * log(2)))
+            self.bits = bytearray((self.nbits + 7) // 8)
+
+    def __bit_positions(self, sequence: str):
+        # Double hashing on the built-in string hash: the filter only lives as long as the process
+        first_hash = hash(sequence)
+        second_hash = hash((sequence, self.nbits)) | 1
+        return [(first_hash + i * second_hash) % self.nbits for i in range(self.nhashes)]
+
+    def __contains__(self, sequence: str) -> bool:
+        if self.bloom_capacity is None:
+            return sequence in self.sequences
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self.__bit_positions(sequence))
+
+    def add(self, sequence: str) -> bool:
+        """
+        Adds a sequence to the cache. Returns False if the sequence was already in the cache.
+        """
+        if self.bloom_capacity is None:
+            if sequence in self.sequences:
+                return False
+            self.sequences[sequence] = None
+        else:
+            added = False
+            for position in self.__bit_positions(sequence):
+                if not self.bits[position >> 3] & (1 << (position & 7)):
+                    self.bits[position >> 3] |= 1 << (position & 7)
+                    added = True
+            if not added:
+                return False
+        self.length += 1
+        return True
+
+    # Kept for code written against the list based cache
+    append = add
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self):
+        if self.bloom_capacity is not None:
+            raise TypeError("A sequence cache in Bloom filter mode does not remember its sequences.")
+        return iter(self.sequences)
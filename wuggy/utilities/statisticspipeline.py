@@ -0,0 +1,48 @@
+from collections import namedtuple
+
+Stage = namedtuple('Stage', ['name', 'function', 'match', 'difference', 'reference', 'reject'])
+
+
+class StatisticsPipeline():
+    """
+    Statistics of a language plugin compiled once for a generation request: every statistic is resolved to its
+    bound function and its match and difference hooks, together with the reference statistic they compare against.
+    Statistics are computed in the given order. A statistic can be given a reject function, which receives its value:
+    a candidate is rejected as soon as one of them returns True, and the statistics after it are not computed.
+    Put cheap statistics which reject most candidates first.
+    """
+
+    def __init__(self, generator, names: [str], reference_statistics: dict = None, rejections: dict = None):
+        reference_statistics = reference_statistics if reference_statistics is not None else {}
+        rejections = rejections if rejections is not None else {}
+        self.generator = generator
+        self.stages = []
+        for name in names:
+            function = getattr(generator.language_plugin, "statistic_%s" % (name))
+            # Without a reference statistic there is nothing to match or take the difference with
+            has_reference = name in reference_statistics
+            self.stages.append(Stage(name, function,
+                                     function.__dict__.get('match') if has_reference else None,
+                                     function.__dict__.get('difference') if has_reference else None,
+                                     reference_statistics.get(name), rejections.get(name)))
+
+    @property
+    def names(self) -> [str]:
+        return [stage.name for stage in self.stages]
+
+    def run(self, sequence, statistics: dict, match_statistics: dict, difference_statistics: dict) -> bool:
+        """
+        Computes the statistics of a sequence into the given dictionaries.
+        Returns False as soon as a statistic rejects the sequence.
+        """
+        generator = self.generator
+        for name, function, match, difference, reference, reject in self.stages:
+            value = function(generator, sequence)
+            statistics[name] = value
+            if match is not None:
+                match_statistics[name] = match(value, reference)
+            if difference is not None:
+                difference_statistics[name] = difference(value, reference)
+            if reject is not None and reject(value):
+                return False
+        return True